@@ -15,9 +15,10 @@ import traceback
 import base64
 import io
 import logging
+import re
 
 # Import the fixed converters
-from mermaid_ivr_converter import convert_mermaid_to_ivr
+from mermaid_ivr_converter import convert_mermaid_to_ivr, reload_voice_database
 from openai import OpenAI
 from db_connection import get_database, test_connection
 from callout_config import CalloutTypeRegistry, CalloutConfigurationManager, callout_manager
@@ -27,6 +28,9 @@ from enhanced_pdf_processor_v2 import EnhancedPDFProcessor, IntelligentPDFProces
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Mermaid code inside a markdown fence in model output
+_MERMAID_CODE_BLOCK = re.compile(r'```(?:mermaid)?\n(.*?)```', re.DOTALL)
+
 # Page configuration
 st.set_page_config(
     page_title="🎯 Complete IVR Converter - All Issues Fixed",
@@ -154,12 +158,13 @@ class EnhancedImageConverter:
 
     def _process_single_image(self, image: Image.Image) -> str:
         """Process a single image and convert to Mermaid"""
-        # Convert to base64
+        # Convert to a PNG data URL - the base64 text goes straight into the URL
         buffered = io.BytesIO()
         image.save(buffered, format="PNG")
-        base64_image = base64.b64encode(buffered.getvalue()).decode()
+        image_url = "data:image/png;base64," + base64.b64encode(buffered.getbuffer()).decode('ascii')
+        del buffered
         
-        return self._call_openai_api(base64_image)
+        return self._call_openai_api(image_url)
 
     def _process_multi_page_images(self, images: list) -> str:
         """Process multiple images and combine into single Mermaid diagram"""
@@ -170,7 +175,7 @@ class EnhancedImageConverter:
         else:
             raise RuntimeError("No valid pages found in PDF")
 
-    def _call_openai_api(self, base64_image: str) -> str:
+    def _call_openai_api(self, image_url: str) -> str:
         """Call OpenAI API with the image"""
         # Enhanced system prompt for call flow focus
         system_prompt = """You are a specialized IVR call flow converter. Extract ONLY the actual call flow elements from diagrams and convert them to clean Mermaid.js syntax.
@@ -223,7 +228,7 @@ Focus ONLY on the actual call flow - ignore everything else."""
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
+                                "url": image_url
                             }
                         }
                     ]
@@ -239,8 +244,7 @@ Focus ONLY on the actual call flow - ignore everything else."""
     def _clean_mermaid_output(self, raw_text: str) -> str:
         """Clean and format Mermaid output"""
         # Extract code from markdown blocks
-        import re
-        code_match = re.search(r'```(?:mermaid)?\n(.*?)```', raw_text, re.DOTALL)
+        code_match = _MERMAID_CODE_BLOCK.search(raw_text)
         if code_match:
             raw_text = code_match.group(1)
         
@@ -410,6 +414,7 @@ def main():
         """)
         
         if st.button("🔄 Refresh Database Status"):
+            reload_voice_database()
             st.rerun()
         
         st.markdown("### 🔧 API Configuration")
@@ -627,9 +632,8 @@ def main():
         st.markdown("### 🔄 Database Control")
         if st.button("🔄 Refresh Database Status", help="Refresh the voice file database connection"):
             with st.spinner("Refreshing database connection..."):
-                # Force refresh of database connection
-                import time
-                time.sleep(1)  # Simulate refresh time
+                # Next conversion re-reads the voice table instead of the shared copy
+                reload_voice_database()
                 st.rerun()
     
     # Show current configuration (moved outside columns for better layout)
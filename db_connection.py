@@ -5,6 +5,7 @@ Handles connection to the callflow-generator-ia-db table.
 
 import boto3
 import os
+import time
 import logging
 import streamlit as st
 from typing import List, Dict, Optional
@@ -13,6 +14,9 @@ from botocore.exceptions import ClientError, NoCredentialsError
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# DynamoDB refreshes ItemCount and TableSizeBytes roughly every six hours
+_TABLE_STATS_TTL_SECONDS = 6 * 60 * 60
+
 class VoiceFileDatabase:
     """
     Handles connection and queries to the DynamoDB voice file database.
@@ -32,6 +36,8 @@ class VoiceFileDatabase:
         self.table = None
         self.connection_status = "disconnected"
         self.error_message = None
+        self._table_stats = None
+        self._table_stats_time = 0.0
         
         self._connect()
     
@@ -236,18 +242,25 @@ class VoiceFileDatabase:
         if self.connection_status != "connected":
             return {"error": "Database not connected"}
         
+        # The status panel checks on every page run - reuse the last describe_table
+        # result until DynamoDB could have refreshed its figures
+        if self._table_stats is not None and time.monotonic() - self._table_stats_time < _TABLE_STATS_TTL_SECONDS:
+            return dict(self._table_stats)
+        
         try:
             # Get table metadata
             table_info = self.table.meta.client.describe_table(TableName=self.table_name)
             item_count = table_info['Table']['ItemCount']
             table_size = table_info['Table']['TableSizeBytes']
             
-            return {
+            self._table_stats = {
                 "item_count": item_count,
                 "table_size_bytes": table_size,
                 "table_size_mb": round(table_size / (1024 * 1024), 2),
                 "status": "active"
             }
+            self._table_stats_time = time.monotonic()
+            return dict(self._table_stats)
             
         except ClientError as e:
             logger.error(f"Error getting table stats: {e.response['Error']['Message']}")
@@ -255,6 +268,13 @@ class VoiceFileDatabase:
         except Exception as e:
             logger.error(f"Unexpected error getting table stats: {str(e)}")
             return {"error": f"Unexpected error: {str(e)}"}
+    
+    def clear_table_stats(self) -> None:
+        """
+        Forget the cached table statistics so the next get_table_stats call
+        asks DynamoDB again.
+        """
+        self._table_stats = None
 
 
 # Global database instance
@@ -272,6 +292,14 @@ def get_database() -> VoiceFileDatabase:
         _db_instance = VoiceFileDatabase()
     return _db_instance
 
+def clear_table_stats() -> None:
+    """
+    Clear the cached table statistics of the global database instance, if one
+    has been created.
+    """
+    if _db_instance is not None:
+        _db_instance.clear_table_stats()
+
 def test_connection() -> Dict[str, any]:
     """
     Test the database connection and return status.
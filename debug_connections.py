@@ -30,7 +30,7 @@ A -->|"retry logic"| A'''
     
     print(f"\nPARSED CONNECTIONS ({len(connections)} total):")
     for i, conn in enumerate(connections, 1):
-        print(f"  {i}. {conn['source']} -->|'{conn['label']}'| {conn['target']}")
+        print(f"  {i}. {conn.source} -->|'{conn.label}'| {conn.target}")
     
     print("\nCRITICAL CONNECTION ANALYSIS:")
     print("-" * 40)
@@ -38,9 +38,9 @@ A -->|"retry logic"| A'''
     # Look for the "input" connection specifically
     input_found = False
     for conn in connections:
-        if 'input' in conn['label'].lower():
-            print(f"FOUND INPUT CONNECTION: {conn['source']} -> {conn['target']}")
-            print(f"  Label: '{conn['label']}'")
+        if 'input' in conn.label.lower():
+            print(f"FOUND INPUT CONNECTION: {conn.source} -> {conn.target}")
+            print(f"  Label: '{conn.label}'")
             input_found = True
     
     if not input_found:
@@ -49,9 +49,9 @@ A -->|"retry logic"| A'''
     
     # Check node A connections
     print(f"\nNODE A CONNECTIONS:")
-    a_connections = [conn for conn in connections if conn['source'] == 'A']
+    a_connections = [conn for conn in connections if conn.source == 'A']
     for conn in a_connections:
-        print(f"  A -->|'{conn['label']}'| {conn['target']}")
+        print(f"  A -->|'{conn.label}'| {conn.target}")
     
     print(f"\nEXPECTED MAPPING FOR NODE A:")
     print(f"  Choice '1' (input) -> B (Employee verification)")
@@ -359,9 +359,9 @@ Format as: flowchart TD
             
             # Clean up the response
             if "```mermaid" in mermaid_code:
-                mermaid_code = mermaid_code.split("```mermaid")[1].split("```")[0].strip()
+                mermaid_code = mermaid_code.partition("```mermaid")[2].partition("```")[0].strip()
             elif "```" in mermaid_code:
-                mermaid_code = mermaid_code.split("```")[1].strip()
+                mermaid_code = mermaid_code.partition("```")[2].partition("```")[0].strip()
             
             return mermaid_code
             
@@ -378,7 +378,7 @@ Format as: flowchart TD
             return "// No image data found"
         
         # Convert image to base64 for OpenAI
-        base64_image = base64.b64encode(image_element.properties["image_data"]).decode()
+        base64_image = base64.b64encode(image_element.properties["image_data"]).decode('ascii')
         
         prompt = """
 Convert this IVR flowchart diagram to Mermaid.js format. Focus on:
@@ -418,9 +418,9 @@ Create a complete Mermaid flowchart starting with 'flowchart TD'
             
             # Clean up the response
             if "```mermaid" in mermaid_code:
-                mermaid_code = mermaid_code.split("```mermaid")[1].split("```")[0].strip()
+                mermaid_code = mermaid_code.partition("```mermaid")[2].partition("```")[0].strip()
             elif "```" in mermaid_code:
-                mermaid_code = mermaid_code.split("```")[1].strip()
+                mermaid_code = mermaid_code.partition("```")[2].partition("```")[0].strip()
             
             return mermaid_code
             
@@ -16,6 +16,53 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Mermaid cleanup patterns applied to every line of generated diagrams
+_BROKEN_NODE_SENTENCE = re.compile(r'\["([^"]*)\[([^"]*?)"\]\s*([^"]*?)\.\]')
+_BROKEN_NODE_TEXT = re.compile(r'\["([^"]*)\[([^"]*?)"\]\s*([^"]*?)\]')
+_QUOTED_BRACKET_WORD = re.compile(r'\[([^"]*?)"\]')
+_BRACKET_WORD = re.compile(r'\[([^\]"]*?)\](?=\s)')
+_TRAILING_NOT_ACTIVE = re.compile(r'not"\]\s*active\.\]$')
+_TRAILING_QUOTE_BRACKET = re.compile(r'([^"]+)"\]\s*([^"]*?)\.\]$')
+_RECTANGLE_NODE = re.compile(r'([A-Z]+)(\[)([^\]]+)(\])')
+_DIAMOND_NODE = re.compile(r'([A-Z]+)(\{)([^\}]+)(\})')
+_BROKEN_ARROW = re.compile(r'--\s+([A-Z])')
+_EXCESS_SPACES = re.compile(r'\s{3,}')
+_COMPLEX_EDGE_LABEL = re.compile(r'\|\s*([^|"]+[,\(\)&;:].*?)\s*\|')
+
+# Diagram summary and validation response parsing
+_DIAGRAM_TITLE = re.compile(r'([A-Z][^"\[\{]*)')
+_RECTANGLE_NODE_TEXT = re.compile(r'[A-Z]\[.*?\]')
+_VALIDATION_REASON = re.compile(r'reason: (.+?)(?:\n|$)')
+
+def _quote_node_content(match) -> str:
+    """Wrap a matched node label in double quotes when it holds Mermaid-breaking characters"""
+    node_id = match.group(1)
+    bracket_type = match.group(2)
+    content = match.group(3)
+    closing_bracket = match.group(4)
+    
+    # Fix common bracket issues first
+    # Handle cases like: [REU"] Callout System.]
+    if '"]' in content and content.count('[') != content.count(']'):
+        # Try to fix unmatched brackets
+        content = content.replace('"]', '').replace('[', '').replace(']', '')
+    
+    # Remove any existing broken quotes
+    if content.startswith('"') and not content.endswith('"'):
+        content = content[1:]  # Remove leading quote
+    if content.endswith('"') and not content.startswith('"'):
+        content = content[:-1]  # Remove trailing quote
+    
+    # Check if content needs quoting (contains commas, parentheses, <br/>, brackets, etc.)
+    needs_quotes = any(char in content for char in [',', '(', ')', '<br/>', '&', ';', ':', '[', ']'])
+    
+    if needs_quotes and not (content.startswith('"') and content.endswith('"')):
+        # Escape any existing quotes in content
+        content = content.replace('"', '&quot;')
+        content = f'"{content}"'
+    
+    return f'{node_id}{bracket_type}{content}{closing_bracket}'
+
 @dataclass
 class PageClassification:
     """Classification result for a PDF page"""
@@ -219,7 +266,7 @@ class IntelligentPDFProcessor:
             img_data = pix.tobytes("png")
             
             # Convert to base64 for OpenAI
-            base64_image = base64.b64encode(img_data).decode()
+            base64_image = base64.b64encode(img_data).decode('ascii')
             
             # Prompt optimized for Mermaid compatibility
             prompt = f"""
@@ -284,9 +331,9 @@ Focus on creating valid Mermaid syntax that will render properly.
                 
                 # Clean up the response
                 if "```mermaid" in mermaid_code:
-                    mermaid_code = mermaid_code.split("```mermaid")[1].split("```")[0].strip()
+                    mermaid_code = mermaid_code.partition("```mermaid")[2].partition("```")[0].strip()
                 elif "```" in mermaid_code:
-                    mermaid_code = mermaid_code.split("```")[1].strip()
+                    mermaid_code = mermaid_code.partition("```")[2].partition("```")[0].strip()
                 
                 # Clean and fix common Mermaid syntax issues
                 mermaid_code = self._clean_mermaid_syntax(mermaid_code)
@@ -303,7 +350,7 @@ Focus on creating valid Mermaid syntax that will render properly.
                     return None
                 
                 # Extract title from first line or key content
-                title_match = re.search(r'([A-Z][^"\[\{]*)', mermaid_code)
+                title_match = _DIAGRAM_TITLE.search(mermaid_code)
                 title = title_match.group(1)[:50] if title_match else f"Diagram {classification.page_number + 1}"
                 
                 return DiagramInfo(
@@ -326,8 +373,8 @@ Focus on creating valid Mermaid syntax that will render properly.
         """Validate the generated Mermaid code against the original diagram"""
         try:
             # Quick validation checks
-            node_count = len(re.findall(r'[A-Z]\[.*?\]', mermaid_code))
-            arrow_count = len(re.findall(r'-->', mermaid_code))
+            node_count = len(_RECTANGLE_NODE_TEXT.findall(mermaid_code))
+            arrow_count = mermaid_code.count('-->')
             
             # Basic sanity checks
             if node_count < 2:
@@ -392,7 +439,7 @@ EXTRA: [any hallucinated elements]
             is_valid = "valid: yes" in result
             
             # Extract reason
-            reason_match = re.search(r'reason: (.+?)(?:\n|$)', result)
+            reason_match = _VALIDATION_REASON.search(result)
             reason = reason_match.group(1) if reason_match else "No specific reason"
             
             return {
@@ -418,69 +465,40 @@ EXTRA: [any hallucinated elements]
                 
                 # Fix Mermaid syntax issues with proper node label quoting
                 # 1. Fix line breaks
-                line = re.sub(r'\\n', '<br/>', line)  # Literal \n becomes <br/>
+                line = line.replace('\\n', '<br/>')  # Literal \n becomes <br/>
                 
                 # 2. Fix node label quoting - wrap complex labels in double quotes
-                # Match node definitions: A[content] or A{content}
-                def quote_node_content(match):
-                    node_id = match.group(1)
-                    bracket_type = match.group(2)
-                    content = match.group(3)
-                    closing_bracket = match.group(4)
-                    
-                    # Fix common bracket issues first
-                    # Handle cases like: [REU"] Callout System.]
-                    if '"]' in content and content.count('[') != content.count(']'):
-                        # Try to fix unmatched brackets
-                        content = content.replace('"]', '').replace('[', '').replace(']', '')
-                    
-                    # Remove any existing broken quotes
-                    if content.startswith('"') and not content.endswith('"'):
-                        content = content[1:]  # Remove leading quote
-                    if content.endswith('"') and not content.startswith('"'):
-                        content = content[:-1]  # Remove trailing quote
-                    
-                    # Check if content needs quoting (contains commas, parentheses, <br/>, brackets, etc.)
-                    needs_quotes = any(char in content for char in [',', '(', ')', '<br/>', '&', ';', ':', '[', ']'])
-                    
-                    if needs_quotes and not (content.startswith('"') and content.endswith('"')):
-                        # Escape any existing quotes in content
-                        content = content.replace('"', '&quot;')
-                        content = f'"{content}"'
-                    
-                    return f'{node_id}{bracket_type}{content}{closing_bracket}'
-                
                 # Fix specific broken patterns first
                 # Fix: ["content [REU"] remaining.]
-                line = re.sub(r'\["([^"]*)\[([^"]*?)"\]\s*([^"]*?)\.\]', r'["\1\2 \3."]', line)
+                line = _BROKEN_NODE_SENTENCE.sub(r'["\1\2 \3."]', line)
                 
                 # Fix: ["content [no"] remaining.]  
-                line = re.sub(r'\["([^"]*)\[([^"]*?)"\]\s*([^"]*?)\]', r'["\1\2 \3"]', line)
+                line = _BROKEN_NODE_TEXT.sub(r'["\1\2 \3"]', line)
                 
                 # Fix remaining bracket patterns within node content
                 # Pattern: [word"] -> word
-                line = re.sub(r'\[([^"]*?)"\]', r'\1', line)
+                line = _QUOTED_BRACKET_WORD.sub(r'\1', line)
                 
                 # Pattern: [word] -> word (for simple cases)
-                line = re.sub(r'\[([^\]"]*?)\](?=\s)', r'\1', line)
+                line = _BRACKET_WORD.sub(r'\1', line)
                 
                 # Fix trailing quotes and brackets at end of lines
-                line = re.sub(r'not"\]\s*active\.\]$', r'not active."]', line)
-                line = re.sub(r'([^"]+)"\]\s*([^"]*?)\.\]$', r'\1 \2."]', line)
+                line = _TRAILING_NOT_ACTIVE.sub(r'not active."]', line)
+                line = _TRAILING_QUOTE_BRACKET.sub(r'\1 \2."]', line)
                 
                 # Apply standard quoting to node definitions
-                line = re.sub(r'([A-Z]+)(\[)([^\]]+)(\])', quote_node_content, line)  # Rectangle nodes
-                line = re.sub(r'([A-Z]+)(\{)([^\}]+)(\})', quote_node_content, line)  # Diamond nodes
+                line = _RECTANGLE_NODE.sub(_quote_node_content, line)  # Rectangle nodes
+                line = _DIAMOND_NODE.sub(_quote_node_content, line)  # Diamond nodes
                 
                 # 3. Fix basic arrow syntax
-                line = re.sub(r'--\s+([A-Z])', r'-->\1', line)  # Fix broken arrows to nodes
+                line = _BROKEN_ARROW.sub(r'-->\1', line)  # Fix broken arrows to nodes
                 
                 # 4. Remove excessive spaces
-                line = re.sub(r'\s{3,}', ' ', line)  # Only remove 3+ spaces
+                line = _EXCESS_SPACES.sub(' ', line)  # Only remove 3+ spaces
                 
                 # 5. Final Mermaid-specific fixes
                 # Fix edge label syntax - ensure quotes around complex labels
-                line = re.sub(r'\|\s*([^|"]+[,\(\)&;:].*?)\s*\|', r'|"\1"|', line)  # Quote complex edge labels
+                line = _COMPLEX_EDGE_LABEL.sub(r'|"\1"|', line)  # Quote complex edge labels
                 
                 cleaned_lines.append(line)
             
@@ -513,21 +531,19 @@ EXTRA: [any hallucinated elements]
     def _validate_mermaid_syntax(self, mermaid_code: str) -> bool:
         """Basic validation of Mermaid syntax"""
         try:
-            lines = mermaid_code.split('\n')
-            
-            # Check for required elements
-            has_flowchart = any('flowchart' in line for line in lines)
-            has_nodes = any('[' in line and ']' in line for line in lines)
-            has_connections = any('-->' in line for line in lines)
+            # Check for required elements - markers without a newline can be searched for in the whole text
+            if 'flowchart' not in mermaid_code or '-->' not in mermaid_code:
+                return False
             
-            # Check for common syntax errors
-            has_unmatched_brackets = False
-            for line in lines:
+            # A node needs both brackets on one line; check for common syntax errors in the same pass
+            has_nodes = False
+            for line in mermaid_code.split('\n'):
                 if line.count('[') != line.count(']') or line.count('{') != line.count('}'):
-                    has_unmatched_brackets = True
-                    break
+                    return False  # Unmatched brackets
+                if not has_nodes:
+                    has_nodes = '[' in line and ']' in line
             
-            return has_flowchart and has_nodes and has_connections and not has_unmatched_brackets
+            return has_nodes
             
         except Exception:
             return True  # If validation fails, assume it's ok
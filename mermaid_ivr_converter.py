@@ -3,16 +3,276 @@ FLEXIBLE PRODUCTION IVR CONVERTER
 Works for ANY flow type - not hardcoded to specific patterns
 """
 
+import io
 import re
+import sys
 import csv
+import copy
 import json
+import logging
+import threading
+import time
 import streamlit as st
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from collections import defaultdict
+from functools import lru_cache
+from operator import attrgetter
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple, Iterable
+from dataclasses import dataclass, field
 from enum import Enum
 from difflib import SequenceMatcher
 from decimal import Decimal
-from db_connection import get_database
+from db_connection import get_database, clear_table_stats
+
+# Optional: faster JSON encoding for convert_mermaid_to_ivr_json - orjson, then msgspec, then stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Optional: rapidfuzz's C Indel similarity bounds difflib ratios so most voice files skip SequenceMatcher
+try:
+    from rapidfuzz.distance.Indel import normalized_similarity as _indel_similarity
+except ImportError:
+    _indel_similarity = None
+
+# Per-node conversion tracing; silent unless DEBUG logging is enabled
+logger = logging.getLogger(__name__)
+
+# Mermaid node shapes matched in a single pass: A[text] / A["text"], A{text}, A(text)
+_NODE_PATTERN = re.compile(
+    r'([A-Z]+)(?:\[(?P<square>[^\]]*?)\]|\{(?P<diamond>[^}]*?)\}|\((?P<round>[^)]*?)\))'
+)
+# The original parser's A["text"] pass - quoted labels may contain ] ("Call [555] now")
+_QUOTED_SQUARE_NODE = re.compile(r'([A-Z]+)\["([^"]*?)"\]')
+# <br/>, <br>, <br /> and literal \n line breaks inside node text
+_LINE_BREAK = re.compile(r'<br\s*/?>|\\n', re.IGNORECASE)
+_CODE_FENCE = re.compile(r'```.*?```', re.DOTALL)
+_FLOWCHART_HEADER = re.compile(r'flowchart\s+TD|graph\s+TD')
+# Segment boundaries for prompt text: line breaks and sentence-ending punctuation
+_SEGMENT_BREAK = re.compile(r'[.!?]+|\n')
+# Quote and backslash characters dropped from prompt text before segmentation
+_SEGMENT_STRIP = str.maketrans('', '', '"\\')
+_WORD = re.compile(r'\b[A-Za-z]+\b')
+_HTML_TAG = re.compile(r'<[^>]+>')
+_PAGE_NUMBER = re.compile(r'page\s+(\d+)')
+_FLOW_REFERENCE_PATTERNS = tuple(re.compile(pattern) for pattern in [
+    r'availability.*status',
+    r'contact.*numbers',
+    r'test.*numbers',
+    r'pin.*name',
+    r'change.*pin'
+])
+
+# Edges with an optional inline node definition on either side and an optional
+# |"label"| or |label| - one pattern so each edge is matched exactly once
+_CONNECTION_PATTERN = re.compile(
+    r'([A-Z]+)(?:\[.*?\]|\{.*?\})?\s*-->\s*'
+    r'(?:\|(?:"(?P<quoted>[^"]+)"|(?P<plain>[^|]+))\|\s*)?'
+    r'([A-Z]+)(?:\[.*?\]|\{.*?\})?'
+)
+
+# Node definition order follows the shape precedence of the original parser:
+# quoted squares first, then diamonds, plain squares and rounded nodes
+_NODE_SHAPE_ORDER = {'square': 2, 'diamond': 1, 'round': 3}
+
+# Words skipped when building labels from question text / generic node text
+_QUESTION_STOPWORDS = frozenset(['the', 'to', 'is', 'was', 'are', 'were'])
+_LABEL_STOPWORDS = frozenset(['the', 'your', 'this', 'that', 'please', 'has', 'been', 'will', 'are', 'is'])
+
+# Phrase batteries used by node type detection and IVR attribute rules
+_EMPLOYEE_VERIFICATION_PHRASES = ('this is employee', 'this is the employee', 'employee verification', 'verify employee')
+_INPUT_PHRASES = ('enter your', 'please enter', 're-enter', 'followed by')
+_DECISION_WORDS = ('match', 'valid', 'correct', 'entered digits')
+_WELCOME_PHRASES = ('welcome', 'this is.*callout', 'hello', 'greeting')
+_WELCOME_PRESS_OPTIONS = frozenset('1379')
+_MENU_PRESS_OPTIONS = frozenset('12')
+_DECISION_PRESS_OPTIONS = frozenset('13')
+_VERIFICATION_QUESTIONS = ('this is', 'are you', 'is this')
+_RESPONSE_WORDS = ('accept', 'decline', 'recorded', 'successfully')
+_NOBARGE_PHRASES = ('notification', 'message', 'important', 'listen carefully')
+_MAIN_LOOP_PHRASES = ('this is an', 'electric callout', 'press 1')
+_CALLOUT_PHRASES = ('callout', 'notification')
+_RETURNSUB_PHRASES = ('receipt', 'message')
+_LOOP_CONTROL_WORDS = ('played', 'times', 'loop', 'repeat', 'again', 'tries', 'attempts')
+# Welcome menu routing for labelled connections without an explicit digit, in priority order
+# ('time' covers 'need more time', 'home' covers 'not home')
+_WELCOME_LABEL_ROUTES = (
+    (('time',), '3'),
+    (('home',), '7'),
+    (('repeat', 'retry'), '9'),
+    (('no input', 'none'), 'error'),
+    (('yes',), '1'),
+    (('no',), '0'),
+)
+_START_INDICATORS = (
+    'welcome', 'this is', 'hello', 'greeting', 'start', 'begin',
+    'please enter', 'enter your', 'pin not', 'invalid pin'
+)
+# Node labels dropped from inbound flows, and goto targets redirected away from them
+_INBOUND_REDUNDANT_LABELS = frozenset(['Main Menu', 'Hangup'])
+# Distinct segment texts remembered per converter in its match and segment caches; the
+# sentinel tells a cached "no match" (None) apart from a miss
+_CONVERTER_CACHE_SIZE = 4096
+_NOT_CACHED = object()
+
+def _store_bounded(cache: Dict[str, Any], key: str, value: Any) -> None:
+    """Store value, dropping the oldest entry first so a long-lived converter's cache stays bounded"""
+    if len(cache) >= _CONVERTER_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+def _literal_prefix(pattern: str) -> str:
+    """Literal text every match of a regex must start with ('' when the pattern opens with syntax)"""
+    if '|' in pattern:
+        return ''  # Any alternative may match, so no prefix is shared by all of them
+    prefix = []
+    for char in pattern:
+        if char in '.\\()[]{}?*+^$':
+            if char in '?*{' and prefix:
+                prefix.pop()  # A quantifier makes the preceding character optional
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+# Special IVR label patterns based on developer feedback and allflows LITE.
+# Each rule carries its literal prefix so texts without it skip the regex search.
+_IVR_LABEL_PATTERNS = tuple((_literal_prefix(pattern), re.compile(pattern, re.DOTALL), replacement) for pattern, replacement in [
+    # Welcome/main entry node patterns (critical fix)
+    (r'welcome.*this is an.*electric callout.*press 1', 'Live Answer'),
+    (r'this is an.*electric callout.*press 1', 'Live Answer'), 
+    (r'electric callout.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
+    (r'press 1.*press 3.*press 7.*press 9', 'Live Answer'),
+    # Additional patterns for electric callout welcome
+    (r'this is an electric callout from.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
+    (r'welcome.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
+    
+    # Core IVR patterns
+    (r'notification.*callout', 'Callout'),
+    (r'custom\s+message', 'Custom Message'),
+    (r'confirm.*receipt', 'Offer'),  # "Confirm" becomes "Offer" per developer feedback
+    (r'accepted?\s+response', 'Accept'),
+    (r'invalid\s+entry', 'Invalid Entry'),
+    (r'disconnect', 'Hangup'),
+    (r'main\s+menu', 'Main Menu'),
+    
+    # PIN related
+    (r'enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Enter PIN'),
+    (r'please\s+enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Enter PIN'),
+    (r're-enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Re-enter PIN'),
+    (r'pin\s+(?:cannot\s+be|not)', 'PIN Restriction'),
+    (r'pin\s+(?:has\s+been\s+)?changed', 'PIN Changed'),
+    (r'new\s+pin', 'New PIN'),
+    
+    # Entry and validation
+    (r'invalid\s+entry', 'Invalid Entry'),
+    (r'invalid\s+(\w+)', r'Invalid \1'),
+    (r'entered\s+digits', 'Entered Digits'),
+    (r'valid\s+digits', 'Valid Digits'),
+    
+    # Name related
+    (r'name\s+(?:has\s+been\s+)?confirmation', 'Name Confirmation'),
+    (r'name\s+(?:has\s+been\s+)?recorded', 'Name Recorded'),
+    (r'name\s+(?:has\s+been\s+)?changed', 'Name Changed'),
+    (r'first\s+time\s+users', 'First Time Users'),
+    (r'automated\s+system\s+needs', 'Name Recording'),
+    
+    # General patterns
+    (r'employee\s+information', 'Employee Information'),
+    (r'selection', 'Selection'),
+    (r'match\s+to\s+first\s+entry', 'Match Check'),
+    (r'your\s+(\w+)\s+(?:has\s+been\s+)?(?:successfully\s+)?changed', r'\1 Changed'),
+    (r'please\s+(\w+)', r'\1'),
+    (r'(\w+)\s+successfully', r'\1 Success'),
+])
+
+
+@lru_cache(maxsize=2048)
+def _label_from_text(node_text: str) -> Optional[str]:
+    """Derive an IVR label from node text alone; None when the text yields no words.
+
+    Pure function of the text, so identical nodes (repeated goodbyes, retries)
+    share one cached result across nodes and converter instances.
+    """
+    text_lower = node_text.lower().strip()
+    
+    # Handle questions/decisions dynamically
+    if '?' in node_text:
+        # Extract the question and make it a label
+        question = node_text.split('?')[0].strip()
+        # Take key words from the question
+        key_words = [word for word in question.split() if len(word) > 2 and word.lower() not in _QUESTION_STOPWORDS]
+        if key_words:
+            return ' '.join(key_words[:3]).title()
+    
+    for prefix, pattern, replacement in _IVR_LABEL_PATTERNS:
+        if prefix not in text_lower:
+            continue
+        match = pattern.search(text_lower)
+        if match:
+            if r'\1' in replacement:
+                return replacement.replace(r'\1', match.group(1).title())
+            else:
+                return replacement
+    
+    # Extract meaningful words from the beginning - only the first two are used
+    meaningful_words = []
+    for word_match in _WORD.finditer(node_text):
+        word = word_match.group()
+        if len(word) > 2 and word.lower() not in _LABEL_STOPWORDS:
+            meaningful_words.append(word)
+            if len(meaningful_words) == 2:
+                break
+    
+    if meaningful_words:
+        return ' '.join(meaningful_words).title()
+    
+    # Last resort - first few words
+    first_words = node_text.split()[:2]
+    if first_words:
+        return ' '.join(word.capitalize() for word in first_words)
+    
+    return None
+
+
+# DTMF digit extraction from connection labels and prompt text
+_SINGLE_DIGIT = re.compile(r'\b(\d)\b')
+_ANY_DIGIT = re.compile(r'\d')
+_PRESS_DIGITS = re.compile(r'press\s+(\d+)')
+_PRESS_OPTION = re.compile(r'press (\d)')
+_DIGIT_COUNT = re.compile(r'(\d+)\s*digit')
+
+# DTMF key -> bit, in ascending key order
+_DTMF_BITS = {str(digit): 1 << digit for digit in range(10)}
+
+def join_dtmf_choices(keys) -> str:
+    """Build a validChoices string ('1|3|7') from the single-digit DTMF keys among keys"""
+    mask = 0
+    for key in keys:
+        mask |= _DTMF_BITS.get(key, 0)
+    return _dtmf_mask_string(mask)
+
+@lru_cache(maxsize=1024)
+def _dtmf_mask_string(mask: int) -> str:
+    """Canonical '|'-joined key string for a DTMF bitmask (at most 1024 distinct values)"""
+    return '|'.join(digit for digit, bit in _DTMF_BITS.items() if mask & bit)
+
+def first_dtmf_digit(label: str) -> Optional[str]:
+    """Return the first standalone digit in a connection label ('1 - accept' -> '1')"""
+    # Most DTMF edges are labeled '<digit> - <action>' - answer those without the regex engine
+    if label[:1].isdecimal() and not (label[1:2].isalnum() or label[1:2] == '_'):
+        return label[0]
+    digit_match = _SINGLE_DIGIT.search(label)
+    return digit_match.group(1) if digit_match else None
+
+@lru_cache(maxsize=4096)
+def _callflow_prompt(callflow_id: str) -> str:
+    """'callflow:<id>' prompt reference, one shared string per voice file across all nodes"""
+    return sys.intern(f"callflow:{callflow_id}")
 
 def safe_str(value: Any) -> str:
     """Safely convert any value (including decimal.Decimal) to string"""
@@ -31,7 +291,7 @@ def clean_branch_key(label: str) -> str:
         return label
     
     # Remove HTML tags
-    label = re.sub(r'<[^>]+>', '', label)
+    label = _HTML_TAG.sub('', label)
     
     # Remove quotes 
     label = label.strip('"\'')
@@ -41,31 +301,638 @@ def clean_branch_key(label: str) -> str:
     
     return label
 
+@lru_cache(maxsize=1024)
 def detect_page_reference(node_text: str) -> Optional[str]:
     """Detect if a node references another page/flow"""
+    # Called with target labels, which repeat across the edges of a flow (Goodbye, Main Menu, ...)
     text_lower = node_text.lower()
     
     # Look for page references
-    page_match = re.search(r'page\s+(\d+)', text_lower)
+    page_match = _PAGE_NUMBER.search(text_lower)
     if page_match:
         return page_match.group(1)
     
     # Look for flow references
-    flow_patterns = [
-        r'availability.*status',
-        r'contact.*numbers',
-        r'test.*numbers', 
-        r'pin.*name',
-        r'change.*pin'
-    ]
-    
-    for pattern in flow_patterns:
-        if re.search(pattern, text_lower):
+    for pattern in _FLOW_REFERENCE_PATTERNS:
+        if pattern.search(text_lower):
             return 'sub_flow'
     
     return None
 
-@dataclass
+def _compile_rule_patterns(key: str, rules: List[Dict]) -> Tuple[Dict, ...]:
+    """Compile the regex stored under key in each rule once, at import time"""
+    for rule in rules:
+        rule[key] = re.compile(rule[key])
+    return tuple(rules)
+
+# Template variable patterns based on production scripts
+_TEMPLATE_VARIABLE_PATTERNS = _compile_rule_patterns('pattern', [
+    # Employee name patterns
+    {
+        'pattern': r'if this is\s*\([^)]*employee[^)]*\)',
+        'prompts': ["callflow:1002", "names:{{contact_id}}"],
+        'logs': ["Press 1 if this is", "Employee name spoken({{contact_id}})"]
+    },
+    {
+        'pattern': r'employee[^)]*\)\s*is not home',
+        'prompts': ["names:{{contact_id}}", "callflow:1004"],
+        'logs': ["Employee name spoken", "is not home"]
+    },
+    {
+        'pattern': r'get\s*\([^)]*employee[^)]*\)\s*to the phone',
+        'prompts': ["names:{{contact_id}}", "callflow:1006"],
+        'logs': ["Employee name spoken", "to the phone"]
+    },
+    {
+        'pattern': r'please have[^)]*\([^)]*employee[^)]*\)',
+        'prompts': ["callflow:1017", "names:{{contact_id}}"],
+        'logs': ["Please have", "Employee name spoken"]
+    },
+    
+    # Location patterns
+    {
+        'pattern': r'electric callout from\s*\([^)]*level[^)]*\)',
+        'prompts': ["callflow:1614", "location:{{level1_location}}"],
+        'logs': ["This is an electric callout from", "Level location spoken"]
+    },
+    {
+        'pattern': r'call the[^)]*\([^)]*level[^)]*\)',
+        'prompts': ["callflow:1174", "location:{{level1_location}}"],
+        'logs': ["call the", "Level location spoken"]
+    },
+    
+    # Callout type patterns
+    {
+        'pattern': r'callout reason is\s*\([^)]*\)',
+        'prompts': ["callflow:1019", "reason:{{callout_reason}}"],
+        'logs': ["The callout reason is", "Callout reason spoken"]
+    },
+    {
+        'pattern': r'trouble location is\s*\([^)]*\)',
+        'prompts': ["callflow:1232", "location:{{callout_location}}"],
+        'logs': ["The trouble location is", "Trouble location spoken"]
+    },
+    
+    # Time/Date patterns
+    {
+        'pattern': r'initiated on.*speaks date.*speaks time',
+        'prompts': ["callflow:1014", "date:{{job_start_date}}", "callflow:1015", "time:{{job_start_time}}"],
+        'logs': ["callout was initiated on", "Speaks date", "at", "Speaks time"]
+    },
+    
+    # Phone number patterns
+    {
+        'pattern': r'call.*system.*at.*phone',
+        'prompts': ["callflow:1174", "callflow:1290", "callflow:1015", "digits:{{callback_number}}"],
+        'logs': ["call the", "callout system", "at", "speak phone number"]
+    },
+    
+    # Production patterns from lead programmer feedback
+    {
+        'pattern': r'this is a.*scheduled overtime.*callout from.*virginia american water',
+        'prompts': ["callflow:1210", "type:{{callout_type}}", "callflow:1192", "company:1201"],
+        'logs': ["This is a", "Scheduled Overtime", "callout from", "Virginia American Water"]
+    },
+    {
+        'pattern': r'it is.*current date and time',
+        'prompts': ["callflow:1231", "current: dow, date, time"],
+        'logs': ["It is", "Speak current date and time"]
+    },
+    {
+        'pattern': r'there is a.*callout.*scheduled for',
+        'prompts': ["callflow:1011", "company:{{company_id}}", "type:{{callout_type}}", "callflow:1274", "callflow:1400"],
+        'logs': ["There is a", "Company name", "Callout type", "callout", "scheduled for"]
+    },
+    {
+        'pattern': r'speaks dow.*speaks date.*speaks time',
+        'prompts': ["dow: {{job_start_date}}", "date: {{job_start_date}}", "time: {{job_start_time}}"],
+        'logs': ["Speaks dow of callout", "Speaks date of callout", "Speaks time of callout"]
+    },
+    {
+        'pattern': r'ending on.*end dow.*end date.*end time',
+        'prompts': ["callflow:1190", "dow: {{job_end_date}}", "date: {{job_end_date}}", "time: {{job_end_time}}"],
+        'logs': ["ending on", "Speaks end dow of callout", "Speaks end date of callout", "Speaks end time of callout"]
+    },
+    {
+        'pattern': r'the location of the work is',
+        'prompts': ["callflow:2808", "location:{{callout_location}}"],
+        'logs': ["The location of the work is", "Location spoken"]
+    },
+    {
+        'pattern': r'you are being called out as a',
+        'prompts': ["callflow:2145", "class:{{job_classification}}"],
+        'logs': ["You are being called out as a", "Job classification spoken"]
+    }
+])
+
+# Most prompt segments carry no '(variable)' placeholder; the rules that need one can be skipped for them
+_PLAIN_TEMPLATE_VARIABLE_PATTERNS = tuple(
+    rule for rule in _TEMPLATE_VARIABLE_PATTERNS if r'\)' not in rule['pattern'].pattern
+)
+
+def _match_template_variables(text_lower: str) -> Optional[Dict]:
+    """First template variable rule matching the lowercased text; the shared rule is returned, not a copy"""
+    # Only scan the placeholder rules when the text has a placeholder to match
+    rules = _TEMPLATE_VARIABLE_PATTERNS if ')' in text_lower else _PLAIN_TEMPLATE_VARIABLE_PATTERNS
+    for rule in rules:
+        if rule['pattern'].search(text_lower):
+            return rule
+    return None
+
+def _contains_any(text: str, phrases: Tuple[str, ...]) -> bool:
+    """Whether any phrase occurs in text - a plain loop, no generator built per check"""
+    for phrase in phrases:
+        if phrase in text:
+            return True
+    return False
+
+@lru_cache(maxsize=1024)
+def _is_employee_verification(text_lower: str) -> bool:
+    """Whether lowercased node text asks to verify the employee"""
+    # Checked by type detection, the decision builder and node conversion for the same text
+    return _contains_any(text_lower, _EMPLOYEE_VERIFICATION_PHRASES)
+
+# Conditional patterns based on production scripts
+_CONDITIONAL_PATTERNS = _compile_rule_patterns('pattern', [
+    # PIN requirement check
+    {
+        'pattern': r'pin.*required|check.*pin|enter.*pin',
+        'branchOn': '{{pin_req}}',
+        'branch': {
+            '1': 'Enter PIN',
+            'next': 'After PIN'
+        }
+    },
+    
+    # Environment-based conditions
+    {
+        'pattern': r'environment|env.*prod|development',
+        'guard': 'function(){ return this.data.env!="prod" && this.data.env!="PROD" }',
+        'guardPrompt': 'callflow:{{env}}'
+    },
+    
+    # Custom message conditions
+    {
+        'pattern': r'custom.*message|play.*custom',
+        'guardPrompt': 'custom:{{custom_message}}'
+    },
+    
+    # Callout reason conditions
+    {
+        'pattern': r'callout.*reason|reason.*is',
+        'guardPrompt': 'reason:{{callout_reason}}'
+    },
+    
+    # Job classification conditions
+    {
+        'pattern': r'job.*classification|working.*as',
+        'guardPrompt': 'class:{{job_classification}}'
+    },
+    
+    # Location-based conditions
+    {
+        'pattern': r'trouble.*location|location.*is',
+        'guardPrompt': 'location:{{callout_location}}'
+    },
+    
+    # English-only conditions
+    {
+        'pattern': r'english.*only|en.*only',
+        'branchOn': '{{en_only}}',
+        'branch': {
+            '1': 'Problems EnOnly',
+            'next': 'Problems Employee'
+        }
+    }
+])
+
+# Critical actions that need confirmation
+_CONFIRMATION_PATTERNS = _compile_rule_patterns('trigger', [
+    {
+        'trigger': r'accept.*callout|available.*to.*work',
+        'action': 'Accept',
+        'choice': '1',
+        'confirm_text': 'You pressed 1 to accept. Please press 1 again to confirm',
+        'confirm_prompt': 'callflow:1366'
+    },
+    {
+        'trigger': r'decline.*callout|not.*available',
+        'action': 'Decline', 
+        'choice': '9',
+        'confirm_text': 'You pressed 9 to decline. Please press 9 again to confirm',
+        'confirm_prompt': 'callflow:2135'
+    },
+    {
+        'trigger': r'supervisor.*acknowledgement|supervisor.*only',
+        'action': 'Supervisor',
+        'choice': '3', 
+        'confirm_text': 'You pressed 3. This is for supervisors only. Press 3 again to confirm',
+        'confirm_prompt': 'callflow:2137'
+    },
+    {
+        'trigger': r'qualified.*no|call.*again',
+        'action': 'QualNo',
+        'choice': '7',
+        'confirm_text': 'You pressed 7 to be called again. Please press 7 again to confirm', 
+        'confirm_prompt': 'callflow:2136'
+    }
+])
+
+# Error handling patterns based on production scripts
+_ERROR_HANDLING_PATTERNS = _compile_rule_patterns('trigger', [
+    # Input validation errors
+    {
+        'trigger': r'invalid.*entry|invalid.*input|try.*again',
+        'maxLoop': ['Loop-Invalid Entry', 5, 'Problems'],
+        'errorPrompt': 'callflow:1009',
+        'nonePrompt': 'callflow:1009',
+        'nobarge': 1
+    },
+    
+    # PIN entry errors
+    {
+        'trigger': r'pin.*incorrect|wrong.*pin|invalid.*pin',
+        'maxLoop': ['Loop-PIN', 3, 'Problems'],
+        'errorPrompt': 'callflow:1009',
+        'nonePrompt': 'callflow:1009'
+    },
+    
+    # Offer retry patterns
+    {
+        'trigger': r'offer.*retry|retry.*offer|try.*again.*offer',
+        'maxLoop': ['Loop-E', 3, 'Problems'],
+        'resetLoop': 'Main'
+    },
+    
+    # Decision retry patterns
+    {
+        'trigger': r'confirm.*retry|confirmation.*error',
+        'maxLoop': ['Loop-F', 3, 'Problems']
+    },
+    
+    # Transfer failure patterns
+    {
+        'trigger': r'transfer.*failed|unable.*transfer',
+        'errorPrompt': 'callflow:1353',
+        'goto': 'Problems'
+    }
+])
+
+def _node_template(template: Dict[str, Any]) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+    """Pair a node template with the keys holding its nested dicts and lists, found once"""
+    return template, tuple(key for key, value in template.items() if isinstance(value, (dict, list)))
+
+# Nodes _add_essential_nodes appends when the diagram does not define them, as
+# (template, nested keys) pairs; copied per conversion with _copy_node_template so
+# callers may mutate the result
+_PIN_NODE_TEMPLATES = tuple(map(_node_template, (
+    {
+        "label": "Check PIN",
+        "branchOn": "{{pin_req}}",
+        "branch": {
+            "1": "Enter PIN",
+            "next": "Callout"
+        }
+    },
+    {
+        "label": "Enter PIN",
+        "log": "Please enter your four digit PIN followed by the pound key",
+        "playPrompt": "callflow:1008",
+        "getDigits": {
+            "numDigits": 5,
+            "maxTries": 3,
+            "maxTime": 7,
+            "validChoices": "{{pin}}",
+            "errorPrompt": "callflow:1009",
+            "nonePrompt": "callflow:1009"
+        },
+        "branch": {
+            "error": "Problems",
+            "none": "Problems"
+        }
+    }
+)))
+
+_PROBLEMS_NODE_TEMPLATES = tuple(map(_node_template, (
+    {
+        "label": "Problems",
+        "gosub": ["SaveCallResult", 1198, "Error Out"]
+    },
+    {
+        "nobarge": 1,
+        "playLog": [
+            "I'm sorry you are having problems.",
+            "Please have",
+            "Employee name",
+            "call the",
+            "Company name",
+            "callout system",
+            "at",
+            "speak phone num"
+        ],
+        "playPrompt": [
+            "callflow:1351",
+            "callflow:1017",
+            "names:{{contact_id}}",
+            "callflow:1174",
+            "company:{{company_id}}",
+            "callflow:1290",
+            "callflow:1015",
+            "digits:{{callback_number}}"
+        ],
+        "goto": "Goodbye"
+    }
+)))
+
+_GOODBYE_NODE_TEMPLATE = _node_template({
+    "label": "Goodbye",
+    "log": "Goodbye(1029)",
+    "playPrompt": "callflow:1029",
+    "nobarge": 1,
+    "goto": "hangup"
+})
+
+_INTERCEPT_NODE_TEMPLATE = _node_template({
+    "label": "Intercept",
+    "nobarge": 1,
+    "playLog": [
+        "The system is currently calling another employee",
+        "To respond to this callout",
+        "please call the",
+        "Company name",
+        "callout system",
+        "at",
+        "speak phone number"
+    ],
+    "playPrompt": [
+        "callflow:1481",
+        "callflow:1482",
+        "callflow:1352",
+        "company:{{company_id}}",
+        "callflow:1290",
+        "callflow:1015",
+        "digits:{{callback_number}}"
+    ],
+    "goto": "Goodbye"
+})
+
+# Static sections emitted by the welcome builder and the confirmation patterns
+_ENVIRONMENT_CHECK_NODE_TEMPLATE = _node_template({
+    "label": "Environment Check",
+    "log": "environment",
+    "playLog": ["Environment check"],
+    "guard": "function (){ return this.data.env!='prod' && this.data.env!='PROD' }",
+    "playPrompt": "callflow:{{env}}",
+    "nobarge": 1
+})
+
+_INVALID_RESPONSE_NODE_TEMPLATE = _node_template({
+    'label': 'Invalid_Response',
+    'log': 'Invalid entry. Please try again',
+    'playPrompt': ['callflow:1009'],
+    'playLog': ['Invalid entry. Please try again'],
+    'maxLoop': ['Loop-D', 3, 'Problems'],
+    'goto': 'Offer',
+    'nobarge': 1
+})
+
+def _copy_node_template(template_entry: Tuple[Dict[str, Any], Tuple[str, ...]]) -> Dict[str, Any]:
+    """Copy a _node_template entry, including its nested dicts and lists"""
+    template, nested_keys = template_entry
+    
+    # C-level copy of the flat node, then fresh containers for the nested values only
+    node = template.copy()
+    for key in nested_keys:
+        node[key] = node[key].copy()
+    return node
+
+def _js_value(value: Any) -> str:
+    """Render an array item or object property value for the JavaScript output"""
+    if isinstance(value, str):
+        return '"{}"'.format(value.replace('"', '\\"'))
+    if type(value) is int:
+        return str(value)  # Same text as json.dumps without the encoder round trip
+    return json.dumps(value)
+
+def _node_to_javascript(node: Dict[str, Any]) -> str:
+    """Render one IVR node as an allflows LITE JavaScript object literal.
+
+    Builders add optional keys (nobarge, maxLoop, returnsub, ...) per node, so
+    rendering stays generic over the node's keys rather than fixed per-type
+    templates.
+    """
+    parts = ["    {\n"]
+    
+    for key, value in node.items():
+        if isinstance(value, str):
+            # Clean log entries - no truncation or double quotes
+            if key == "log":
+                # Remove quotes and truncation
+                clean_value = value.replace('"', '').replace('...', '').strip()
+                if len(clean_value) > 100:
+                    clean_value = clean_value[:100]  # Reasonable limit without "..."
+                parts.append(f'        {key}: "{clean_value}",\n')
+            else:
+                escaped_value = value.replace('"', '\\"').replace('\n', '\\n')
+                parts.append(f'        {key}: "{escaped_value}",\n')
+        
+        elif isinstance(value, list):
+            # Handle arrays - special formatting for gosub
+            if key == "gosub" and len(value) == 3:
+                # Simple gosub format: ["SaveCallResult", 1001, "Accept"]
+                parts.append(f'        {key}: ["{value[0]}", {value[1]}, "{value[2]}"],\n')
+            else:
+                items = [f'            {_js_value(item)}' for item in value]
+                parts.append(f'        {key}: [\n')
+                if items:
+                    parts.append(",\n".join(items))
+                    parts.append("\n")
+                parts.append("        ],\n")
+        
+        elif isinstance(value, dict):
+            # Handle objects - NO quotes around property names for allflows LITE format
+            # Property names (digits, error, none, ...) are emitted unquoted
+            properties = [f'            {dict_key}: {_js_value(dict_value)}' for dict_key, dict_value in value.items()]
+            parts.append(f'        {key}: {{\n')
+            if properties:
+                parts.append(",\n".join(properties))
+                parts.append("\n")
+            parts.append("        },\n")
+        
+        elif isinstance(value, int):
+            parts.append(f'        {key}: {value},\n')
+        else:
+            parts.append(f'        {key}: {json.dumps(value)},\n')
+    
+    parts.append("    }")
+    return "".join(parts)
+
+# Essential ARCOS callflow files for IVR operation when DynamoDB fails: (transcript, callflow_id)
+_ARCOS_CORE_FALLBACK_FILES = (
+    # Welcome and navigation
+    ("Welcome to the", "1011"),
+    ("automated callout system", "1011"), 
+    ("If you are the employee", "1012"),
+    ("Press 1 if you are the employee", "1012"),
+    ("Otherwise press 2", "1013"),
+    ("Press 2 if you are not the employee", "1013"),
+
+    # PIN entry and validation  
+    ("Please enter your four digit PIN", "1008"),
+    ("followed by the pound key", "1008"),
+    ("Invalid PIN", "1009"),
+    ("Thank you", "1014"),
+
+    # Call flow responses
+    ("You are being called to", "1025"),
+    ("If you can report", "1020"),
+    ("Press 1 to accept", "1001"),
+    ("Press 2 to decline", "1002"),
+    ("Press 3 for qualified no", "1145"),
+    ("You have accepted", "1297"),
+    ("You have declined", "1298"),
+
+    # Error handling and confirmations
+    ("Invalid entry", "1009"),
+    ("Please try again", "1009"),
+    ("Thank you for your response", "1035"),
+    ("Good bye", "1040"),
+
+    # Additional common prompts
+    ("Please listen carefully", "1302"),
+    ("To confirm receipt", "1035"),
+    ("call the", "1174"),
+    ("callout system", "1290"),
+    ("at", "1015"),
+    ("Your PIN cannot be", "1139"),
+    ("Please enter your new four digit PIN", "1097"),
+    ("Please re-enter your new four digit PIN", "1097"),
+    ("Your pin has been changed successfully", "1100"),
+    ("Your name has been successfully changed", "1104"),
+    ("The automated system needs your spoken name", "1164"),
+    ("Match to first entry", "1703"),
+
+    # Standard press options
+    ("Press 7", "PRS7NEU"),
+    ("Press 9", "PRS9NEU"),
+    ("Press 1", "PRS1NEU"),
+    ("Press 3", "PRS3NEU"),
+
+    # Response confirmations
+    ("Accept", "1001"),
+    ("Decline", "1002"), 
+    ("Not Home", "1006"),
+    ("Qualified No", "1145"),
+
+    # Time/environment
+    ("current date and time", "CURR_TIME"),
+    ("environment", "ENV_VAR"),
+)
+
+# Critical ARCOS files added when DynamoDB lacks their callflow IDs
+_CRITICAL_ARCOS_FILES = (
+    ("Invalid entry", "1009"),
+    ("Please enter your four digit PIN", "1008"), 
+    ("You have accepted", "1297"),
+    ("You have declined", "1298"),
+    ("Accept", "1001"),
+    ("Decline", "1002"),
+    ("Good bye", "1040"),
+)
+
+# ARCOS fallback recordings based on allflows LITE patterns and developer feedback
+_ARCOS_FALLBACK_FILES = (
+    # Notification/Message recordings (from developer feedback)
+    ("This is an important call notification message. Please listen carefully.", "1302"),
+    ("This is not a callout request", "1614"),
+    ("This is not a callout- do not report to work", "1615"),
+    ("you have accepted receipt of this message", "1297"),
+    ("to confirm receipt of the msg, press1. to replay the msg press 3", "1035"),
+
+    # Core callflow elements (from allflows LITE)
+    ("This is a", "1210"),    # Primary greeting - FIXED
+    ("This is an", "1191"),   # Alternative greeting
+    ("callout", "1274"),      # Callout noun
+    ("from", "1192"),         # Location connector - FIXED
+    ("It is", "1231"),        # Time introducer
+    ("Press 1 if this is", "1002"),
+    ("if you need more time to get", "1005"),
+    ("to the phone", "1006"),
+    ("is not home", "1004"),
+    ("to repeat this message", "1643"),
+    ("The callout reason is", "1019"),
+    ("The trouble location is", "1232"),
+    ("Please have", "1017"),
+    ("call the", "1174"),
+    ("callout system", "1290"),
+    ("at", "1015"),
+    ("Invalid entry", "1009"),
+    ("Please enter your four digit PIN", "1008"),
+    ("followed by the pound key", "1008"),
+    ("You have accepted", "1297"),
+    ("Please listen carefully", "1302"),
+    ("To confirm receipt", "1035"),
+    ("Problems", "1351"),
+    ("I'm sorry you are having problems", "1351"),
+
+    # Missing voice files from lead programmer feedback
+    ("There is a", "1011"),
+    ("scheduled for", "1400"),
+    ("ending on", "1190"),
+    ("The location of the work is", "2808"),
+    ("You are being called out as a", "2145"),
+    ("To bypass this answering machine message and respond to this callout you may press 1 or call the", "1207"),
+    ("Thank you, good bye", "1029"),
+    ("The system is currently calling another employee", "1481"),
+    ("To respond to this callout", "1482"),
+    ("please call the", "1352"),
+    ("An accepted response has been recorded", "1167"),
+    ("Your response has been recorded as a decline", "1021"),
+    ("You pressed 1 to accept, Please press 1 again to confirm", "1366"),
+    ("You pressed 3 to decline, please press 3 again to confirm", "1291"),
+    ("Are you available to work this callout?", "2070"),
+    ("If Yes, press 1. If No, press 3", "2171"),
+    ("If no one else accepts, and you want to be called again", "2173"),
+    ("You pressed 5 to be called again if no one else at your center accepts", "2756"),
+    ("Please press 5 again to confirm", "1841"),
+    ("Your response is being recorded as a qualified no", "1354"),
+    ("You may be called again if no one else at your center accepts", "2005"),
+
+    # PIN and validation
+    ("Your PIN cannot be", "1139"),
+    ("Please enter your new four digit PIN", "1097"),
+    ("Please re-enter your new four digit PIN", "1097"),
+    ("Your pin has been changed successfully", "1100"),
+    ("Your name has been successfully changed", "1104"),
+    ("The automated system needs your spoken name", "1164"),
+    ("Match to first entry", "1703"),
+
+    # Standard press options
+    ("Press 7", "PRS7NEU"),
+    ("Press 9", "PRS9NEU"),
+    ("Press 1", "PRS1NEU"),
+    ("Press 3", "PRS3NEU"),
+    ("Press 5", "PRS5DWN"),
+
+    # Response confirmations
+    ("Accept", "1001"),
+    ("Decline", "1002"), 
+    ("Not Home", "1006"),
+    ("Qualified No", "1145"),
+
+    # Time/environment
+    ("current date and time", "CURR_TIME"),
+    ("environment", "ENV_VAR"),
+)
+
+class Connection(NamedTuple):
+    """A parsed Mermaid edge; label_lower is precomputed for the node builders"""
+    source: str
+    target: str
+    label: str
+    label_lower: str
+
+@dataclass(slots=True, frozen=True)
 class VoiceFile:
     company: str
     folder: str
@@ -73,14 +940,84 @@ class VoiceFile:
     transcript: str
     callflow_id: str
     priority: int  # Higher = better (ARCOS = 100, client-specific = 200)
+    # Derived once at load so voice matching never re-lowers or re-splits a transcript
+    transcript_lower: str = field(init=False, repr=False, compare=False)
+    transcript_tokens: frozenset = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self) -> None:
+        # Frozen so indexes can share instances safely - derived fields are set through object.__setattr__
+        set_field = object.__setattr__
+        intern = sys.intern
+        
+        # Companies, folders, callflow ids and transcript words repeat across thousands of rows
+        for name in ('company', 'folder', 'callflow_id'):
+            value = getattr(self, name)
+            if type(value) is str:
+                set_field(self, name, intern(value))
+        transcript_lower = intern(self.transcript.lower())
+        set_field(self, 'transcript_lower', transcript_lower)
+        set_field(self, 'transcript_tokens', frozenset(map(intern, transcript_lower.split())))
+
+def _read_csv_columns(csv_file, columns: Tuple[Tuple[str, str], ...]) -> Iterable[Tuple[Optional[str], ...]]:
+    """Yield one tuple of the requested (column, default) values per CSV data row.
+
+    Matches csv.DictReader row.get(column, default) - blank lines are skipped and
+    short rows give None - without building a dict for every row.
+    """
+    if isinstance(csv_file, io.TextIOBase):
+        # Open text files and StringIO feed the reader line by line - no full-file copy
+        reader = csv.reader(csv_file)
+    else:
+        # Uploads (Streamlit's UploadedFile is a BytesIO) are read and decoded once
+        content = csv_file.read()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        reader = csv.reader(io.StringIO(content))
+    header = next(reader, None)
+    if header is None:
+        return
+    
+    # Later duplicate headers win, as in DictReader
+    index = {name: position for position, name in enumerate(header)}
+    positions = [(index.get(column), default) for column, default in columns]
+    for row in reader:
+        if not row:
+            continue
+        width = len(row)
+        yield tuple(
+            default if position is None else (row[position] if position < width else None)
+            for position, default in positions
+        )
+
+_ARCOS_CSV_COLUMNS = (('File Name', ''), ('Company', 'ARCOS'), ('Folder', 'callflow'), ('Transcript', ''))
+_CLIENT_CSV_COLUMNS = (('File Name', ''), ('Company', ''), ('Folder', ''), ('Transcript', ''))
 
 class FlexibleARCOSConverter:
-    def __init__(self, cf_general_csv=None, arcos_csv=None, use_dynamodb=True):
+    def __init__(self, cf_general_csv=None, arcos_csv=None, use_dynamodb: bool = True) -> None:
         # Voice file databases with priority system
         self.voice_files: List[VoiceFile] = []
-        self.transcript_index: Dict[str, List[VoiceFile]] = {}
+        self.transcript_index: Dict[str, Tuple[VoiceFile, ...]] = {}
         self.callflow_index: Dict[str, VoiceFile] = {}  # callflow_id -> best voice file
+        # Lowered transcript -> callflow id of the first voice file with that transcript
+        self._exact_transcript_index: Dict[str, str] = {}
+        # (matcher primed with the transcript, voice file) in voice_files order
+        self._match_candidates: List[Tuple[SequenceMatcher, VoiceFile]] = []
         self.use_dynamodb = use_dynamodb
+        # Where the voice files came from: "dynamodb", "csv", or "fallback" when DynamoDB
+        # was requested but could not be read and the dbinfo/built-in tables were loaded
+        self.voice_source = "dynamodb" if use_dynamodb else "csv"
+        # Normalised segment text -> matched callflow id (or None), filled by _find_best_match_flexible
+        self._match_cache: Dict[str, Optional[str]] = {}
+        # Stripped segment text -> (prompts, logs), filled by _segment_prompts_and_logs
+        self._segment_cache: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        
+        # Node type -> builder dispatch used by _convert_node_to_ivr_flexible
+        self._node_builders = {
+            'decision': self._create_decision_node_flexible,
+            'input': self._create_input_node_flexible,
+            'menu': self._create_menu_node_flexible,
+            'welcome': self._create_welcome_node_flexible,
+        }
         
         # Load databases in priority order
         if use_dynamodb:
@@ -93,10 +1030,11 @@ class FlexibleARCOSConverter:
         
         self._build_optimized_indexes()
 
-    def _load_dynamodb_database(self):
+    def _load_dynamodb_database(self) -> None:
         """Load voice files from DynamoDB table"""
         print("Loading voice files from DynamoDB...")
         
+        # Every fallback path below goes through _load_csv_fallback_database
         try:
             db = get_database()
             connection_status = db.get_connection_status()
@@ -151,12 +1089,12 @@ class FlexibleARCOSConverter:
             print("INFO: Falling back to CSV database files...")
             self._load_csv_fallback_database()
 
-    def _load_csv_fallback_database(self):
+    def _load_csv_fallback_database(self) -> None:
         """Load CSV files from dbinfo folder as fallback when DynamoDB fails"""
         print("Loading CSV fallback database from dbinfo folder...")
+        self.voice_source = "fallback"
         
         import os
-        import io
         
         # Try to load ARCOS database from dbinfo folder
         arcos_csv_path = os.path.join(os.path.dirname(__file__), 'dbinfo', 'arcos_general_structure.csv')
@@ -166,13 +1104,9 @@ class FlexibleARCOSConverter:
         if os.path.exists(arcos_csv_path):
             try:
                 print(f"Loading ARCOS database from: {arcos_csv_path}")
+                # The loaders only read() the file - hand over the open file rather than a buffered copy
                 with open(arcos_csv_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Create a mock file object for compatibility with existing method
-                    mock_file = io.StringIO(content)
-                    mock_file.name = 'arcos_general_structure.csv'
-                    mock_file.size = len(content)
-                    self._load_arcos_database(mock_file)
+                    self._load_arcos_database(f)
             except Exception as e:
                 print(f"ERROR: Failed to load ARCOS CSV: {e}")
                 print("INFO: Using built-in ARCOS fallback...")
@@ -187,84 +1121,18 @@ class FlexibleARCOSConverter:
             try:
                 print(f"Loading client database from: {cf_csv_path}")
                 with open(cf_csv_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Create a mock file object for compatibility with existing method
-                    mock_file = io.StringIO(content)
-                    mock_file.name = 'cf_general_structure.csv'
-                    mock_file.size = len(content)
-                    self._load_client_database(mock_file)
+                    self._load_client_database(f)
             except Exception as e:
                 print(f"ERROR: Failed to load client CSV: {e}")
         else:
             print(f"INFO: Client CSV not found at {cf_csv_path} - using ARCOS only")
 
-    def _load_arcos_fallback_database(self):
+    def _load_arcos_fallback_database(self) -> None:
         """Load ARCOS foundation database as fallback when DynamoDB fails"""
         print("Loading ARCOS fallback database...")
         
         # Essential ARCOS callflow files for IVR operation
-        arcos_core_files = [
-            # Welcome and navigation
-            ("Welcome to the", "1011"),
-            ("automated callout system", "1011"), 
-            ("If you are the employee", "1012"),
-            ("Press 1 if you are the employee", "1012"),
-            ("Otherwise press 2", "1013"),
-            ("Press 2 if you are not the employee", "1013"),
-            
-            # PIN entry and validation  
-            ("Please enter your four digit PIN", "1008"),
-            ("followed by the pound key", "1008"),
-            ("Invalid PIN", "1009"),
-            ("Thank you", "1014"),
-            
-            # Call flow responses
-            ("You are being called to", "1025"),
-            ("If you can report", "1020"),
-            ("Press 1 to accept", "1001"),
-            ("Press 2 to decline", "1002"),
-            ("Press 3 for qualified no", "1145"),
-            ("You have accepted", "1297"),
-            ("You have declined", "1298"),
-            
-            # Error handling and confirmations
-            ("Invalid entry", "1009"),
-            ("Please try again", "1009"),
-            ("Thank you for your response", "1035"),
-            ("Good bye", "1040"),
-            
-            # Additional common prompts
-            ("Please listen carefully", "1302"),
-            ("To confirm receipt", "1035"),
-            ("call the", "1174"),
-            ("callout system", "1290"),
-            ("at", "1015"),
-            ("Your PIN cannot be", "1139"),
-            ("Please enter your new four digit PIN", "1097"),
-            ("Please re-enter your new four digit PIN", "1097"),
-            ("Your pin has been changed successfully", "1100"),
-            ("Your name has been successfully changed", "1104"),
-            ("The automated system needs your spoken name", "1164"),
-            ("Match to first entry", "1703"),
-            
-            # Standard press options
-            ("Press 7", "PRS7NEU"),
-            ("Press 9", "PRS9NEU"),
-            ("Press 1", "PRS1NEU"),
-            ("Press 3", "PRS3NEU"),
-            
-            # Response confirmations
-            ("Accept", "1001"),
-            ("Decline", "1002"), 
-            ("Not Home", "1006"),
-            ("Qualified No", "1145"),
-            
-            # Time/environment
-            ("current date and time", "CURR_TIME"),
-            ("environment", "ENV_VAR"),
-        ]
-        
-        for transcript, callflow_id in arcos_core_files:
+        for transcript, callflow_id in _ARCOS_CORE_FALLBACK_FILES:
             voice_file = VoiceFile(
                 company="ARCOS",
                 folder="callflow",
@@ -275,24 +1143,14 @@ class FlexibleARCOSConverter:
             )
             self.voice_files.append(voice_file)
         
-        print(f"SUCCESS: Loaded {len(arcos_core_files)} ARCOS fallback recordings")
+        print(f"SUCCESS: Loaded {len(_ARCOS_CORE_FALLBACK_FILES)} ARCOS fallback recordings")
 
-    def _add_arcos_fallback_if_missing(self):
+    def _add_arcos_fallback_if_missing(self) -> None:
         """Add ARCOS fallback files for any critical IDs not found in DynamoDB"""
         existing_callflow_ids = {vf.callflow_id for vf in self.voice_files}
         
-        critical_arcos_files = [
-            ("Invalid entry", "1009"),
-            ("Please enter your four digit PIN", "1008"), 
-            ("You have accepted", "1297"),
-            ("You have declined", "1298"),
-            ("Accept", "1001"),
-            ("Decline", "1002"),
-            ("Good bye", "1040"),
-        ]
-        
         added_count = 0
-        for transcript, callflow_id in critical_arcos_files:
+        for transcript, callflow_id in _CRITICAL_ARCOS_FILES:
             if callflow_id not in existing_callflow_ids:
                 voice_file = VoiceFile(
                     company="ARCOS",
@@ -308,29 +1166,22 @@ class FlexibleARCOSConverter:
         if added_count > 0:
             print(f"INFO: Added {added_count} critical ARCOS fallback files")
 
-    def _load_arcos_database(self, arcos_csv_file):
+    def _load_arcos_database(self, arcos_csv_file) -> None:
         """Load ARCOS recordings as foundation layer (Priority 100)"""
         print("Loading ARCOS foundation database...")
         
         if arcos_csv_file:
             try:
-                import io
-                content = arcos_csv_file.read()
-                if isinstance(content, bytes):
-                    content = content.decode('utf-8')
-                
-                csv_reader = csv.DictReader(io.StringIO(content))
                 arcos_count = 0
                 
-                for row in csv_reader:
-                    file_name = row.get('File Name', '')
+                for file_name, company, folder, transcript in _read_csv_columns(arcos_csv_file, _ARCOS_CSV_COLUMNS):
                     callflow_id = file_name.replace('.ulaw', '') if file_name else f"ARCOS{arcos_count}"
                     
                     voice_file = VoiceFile(
-                        company=row.get('Company', 'ARCOS'),
-                        folder=row.get('Folder', 'callflow'),
+                        company=company,
+                        folder=folder,
                         file_name=file_name,
-                        transcript=row.get('Transcript', ''),
+                        transcript=transcript,
                         callflow_id=callflow_id,
                         priority=100  # ARCOS foundation priority
                     )
@@ -346,96 +1197,12 @@ class FlexibleARCOSConverter:
         else:
             self._load_arcos_fallbacks()
 
-    def _load_arcos_fallbacks(self):
+    def _load_arcos_fallbacks(self) -> None:
         """Load ARCOS fallback recordings based on allflows LITE patterns"""
         print("Loading ARCOS fallback recordings...")
         
         # Enhanced ARCOS recordings based on developer feedback
-        arcos_core_files = [
-            # Notification/Message recordings (from developer feedback)
-            ("This is an important call notification message. Please listen carefully.", "1302"),
-            ("This is not a callout request", "1614"),
-            ("This is not a callout- do not report to work", "1615"),
-            ("you have accepted receipt of this message", "1297"),
-            ("to confirm receipt of the msg, press1. to replay the msg press 3", "1035"),
-            
-            # Core callflow elements (from allflows LITE)
-            ("This is a", "1210"),    # Primary greeting - FIXED
-            ("This is an", "1191"),   # Alternative greeting
-            ("callout", "1274"),      # Callout noun
-            ("from", "1192"),         # Location connector - FIXED
-            ("It is", "1231"),        # Time introducer
-            ("Press 1 if this is", "1002"),
-            ("if you need more time to get", "1005"),
-            ("to the phone", "1006"),
-            ("is not home", "1004"),
-            ("to repeat this message", "1643"),
-            ("The callout reason is", "1019"),
-            ("The trouble location is", "1232"),
-            ("Please have", "1017"),
-            ("call the", "1174"),
-            ("callout system", "1290"),
-            ("at", "1015"),
-            ("Invalid entry", "1009"),
-            ("Please enter your four digit PIN", "1008"),
-            ("followed by the pound key", "1008"),
-            ("You have accepted", "1297"),
-            ("Please listen carefully", "1302"),
-            ("To confirm receipt", "1035"),
-            ("Problems", "1351"),
-            ("I'm sorry you are having problems", "1351"),
-            
-            # Missing voice files from lead programmer feedback
-            ("There is a", "1011"),
-            ("scheduled for", "1400"),
-            ("ending on", "1190"),
-            ("The location of the work is", "2808"),
-            ("You are being called out as a", "2145"),
-            ("To bypass this answering machine message and respond to this callout you may press 1 or call the", "1207"),
-            ("Thank you, good bye", "1029"),
-            ("The system is currently calling another employee", "1481"),
-            ("To respond to this callout", "1482"),
-            ("please call the", "1352"),
-            ("An accepted response has been recorded", "1167"),
-            ("Your response has been recorded as a decline", "1021"),
-            ("You pressed 1 to accept, Please press 1 again to confirm", "1366"),
-            ("You pressed 3 to decline, please press 3 again to confirm", "1291"),
-            ("Are you available to work this callout?", "2070"),
-            ("If Yes, press 1. If No, press 3", "2171"),
-            ("If no one else accepts, and you want to be called again", "2173"),
-            ("You pressed 5 to be called again if no one else at your center accepts", "2756"),
-            ("Please press 5 again to confirm", "1841"),
-            ("Your response is being recorded as a qualified no", "1354"),
-            ("You may be called again if no one else at your center accepts", "2005"),
-            
-            # PIN and validation
-            ("Your PIN cannot be", "1139"),
-            ("Please enter your new four digit PIN", "1097"),
-            ("Please re-enter your new four digit PIN", "1097"),
-            ("Your pin has been changed successfully", "1100"),
-            ("Your name has been successfully changed", "1104"),
-            ("The automated system needs your spoken name", "1164"),
-            ("Match to first entry", "1703"),
-            
-            # Standard press options
-            ("Press 7", "PRS7NEU"),
-            ("Press 9", "PRS9NEU"),
-            ("Press 1", "PRS1NEU"),
-            ("Press 3", "PRS3NEU"),
-            ("Press 5", "PRS5DWN"),
-            
-            # Response confirmations
-            ("Accept", "1001"),
-            ("Decline", "1002"), 
-            ("Not Home", "1006"),
-            ("Qualified No", "1145"),
-            
-            # Time/environment
-            ("current date and time", "CURR_TIME"),
-            ("environment", "ENV_VAR"),
-        ]
-        
-        for transcript, callflow_id in arcos_core_files:
+        for transcript, callflow_id in _ARCOS_FALLBACK_FILES:
             voice_file = VoiceFile(
                 company="ARCOS",
                 folder="callflow",
@@ -446,9 +1213,9 @@ class FlexibleARCOSConverter:
             )
             self.voice_files.append(voice_file)
         
-        print(f"Loaded {len(arcos_core_files)} ARCOS fallback recordings")
+        print(f"Loaded {len(_ARCOS_FALLBACK_FILES)} ARCOS fallback recordings")
 
-    def _load_client_database(self, cf_general_csv):
+    def _load_client_database(self, cf_general_csv) -> None:
         """Load client-specific recordings as overrides (Priority 200)"""
         if not cf_general_csv:
             print("INFO: No client database provided - using ARCOS foundation only")
@@ -457,23 +1224,16 @@ class FlexibleARCOSConverter:
         print("LOADING: Client-specific override database...")
         
         try:
-            import io
-            content = cf_general_csv.read()
-            if isinstance(content, bytes):
-                content = content.decode('utf-8')
-            
-            csv_reader = csv.DictReader(io.StringIO(content))
             client_count = 0
             
-            for row in csv_reader:
-                file_name = row.get('File Name', '')
+            for file_name, company, folder, transcript in _read_csv_columns(cf_general_csv, _CLIENT_CSV_COLUMNS):
                 callflow_id = file_name.replace('.ulaw', '') if file_name else f"CLIENT{client_count}"
                 
                 voice_file = VoiceFile(
-                    company=row.get('Company', ''),
-                    folder=row.get('Folder', ''),
+                    company=company,
+                    folder=folder,
                     file_name=file_name,
-                    transcript=row.get('Transcript', ''),
+                    transcript=transcript,
                     callflow_id=callflow_id,
                     priority=200  # Client override priority
                 )
@@ -486,33 +1246,49 @@ class FlexibleARCOSConverter:
         except Exception as e:
             print(f"ERROR: Loading client database: {e}")
 
-    def _build_optimized_indexes(self):
+    def _build_optimized_indexes(self) -> None:
         """Build optimized indexes with priority-based selection"""
         print("BUILDING: Optimized voice indexes with ARCOS foundation...")
         
-        # Build transcript index for searching
-        for voice_file in self.voice_files:
-            transcript_words = voice_file.transcript.lower().split()
-            for word in transcript_words:
-                if word not in self.transcript_index:
-                    self.transcript_index[word] = []
-                self.transcript_index[word].append(voice_file)
-        
-        # Build callflow index - prefer higher priority (client-specific over ARCOS)
+        # One pass over the voice files builds both indexes and the layer counts
+        transcript_index = defaultdict(list)
         callflow_priority_map = {}
+        exact_transcripts = {}
+        match_candidates = []
+        arcos_count = 0
+        client_count = 0
         for voice_file in self.voice_files:
+            # Build transcript index for searching
+            for word in voice_file.transcript_tokens:
+                transcript_index[word].append(voice_file)
+            
+            # Prime the matcher for each transcript once instead of per lookup
+            exact_transcripts.setdefault(voice_file.transcript_lower, voice_file.callflow_id)
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(voice_file.transcript_lower)
+            match_candidates.append((matcher, voice_file))
+            
+            # Build callflow index - prefer higher priority (client-specific over ARCOS)
             cid = voice_file.callflow_id
-            if cid not in callflow_priority_map or voice_file.priority > callflow_priority_map[cid].priority:
+            current = callflow_priority_map.get(cid)
+            if current is None or voice_file.priority > current.priority:
                 callflow_priority_map[cid] = voice_file
+            
+            if voice_file.priority == 100:
+                arcos_count += 1
+            elif voice_file.priority == 200:
+                client_count += 1
         
         self.callflow_index = callflow_priority_map
-        
-        # Sort transcript indexes by priority (highest first)
-        for word in self.transcript_index:
-            self.transcript_index[word].sort(key=lambda vf: vf.priority, reverse=True)
-        
-        arcos_count = sum(1 for vf in self.voice_files if vf.priority == 100)
-        client_count = sum(1 for vf in self.voice_files if vf.priority == 200)
+        self._exact_transcript_index = exact_transcripts
+        self._match_candidates = match_candidates
+        
+        # Sort transcript indexes by priority (highest first) and freeze the posting lists
+        by_priority = attrgetter('priority')
+        self.transcript_index = {
+            word: tuple(sorted(word_files, key=by_priority, reverse=True))
+            for word, word_files in transcript_index.items()
+        }
         
         print(f"SUCCESS: Indexed {arcos_count} ARCOS + {client_count} client recordings")
         print(f"SUCCESS: {len(self.callflow_index)} unique callflow IDs available")
@@ -533,30 +1309,39 @@ class FlexibleARCOSConverter:
         for node_id, node_text in nodes.items():
             meaningful_label = self._generate_flexible_label(node_text, node_id)
             
-            # Handle duplicate labels by adding suffixes
-            original_label = meaningful_label
-            if meaningful_label in label_counts:
-                label_counts[meaningful_label] += 1
-                meaningful_label = f"{original_label} {label_counts[meaningful_label]}"
-            else:
+            # Handle duplicate labels by adding suffixes - one counter lookup per label
+            duplicates = label_counts.get(meaningful_label)
+            if duplicates is None:
                 label_counts[meaningful_label] = 0
+            else:
+                duplicates += 1
+                label_counts[meaningful_label] = duplicates
+                meaningful_label = f"{meaningful_label} {duplicates}"
             
-            node_id_to_label[node_id] = meaningful_label
+            # Labels repeat across nodes and are used as branch/goto targets - keep one copy of each
+            node_id_to_label[node_id] = sys.intern(meaningful_label)
         
-        print(f"MAPPINGS: Node mappings: {node_id_to_label}")
+        logger.debug("MAPPINGS: Node mappings: %s", node_id_to_label)
+        
+        # Index outgoing connections by source node and collect edge targets in one pass
+        connections_by_source = defaultdict(list)
+        incoming_targets = set()
+        for conn in connections:
+            connections_by_source[conn.source].append(conn)
+            incoming_targets.add(conn.target)
         
         # Convert nodes to IVR format
         ivr_flow = []
-        start_node_id = self._find_start_node(nodes, connections)
+        start_node_id = self._find_start_node(nodes, incoming_targets)
         processed_nodes = set()
         
         # Process in logical order
-        self._process_node_recursive(start_node_id, nodes, connections, node_id_to_label, ivr_flow, processed_nodes)
+        self._process_nodes_in_flow_order(start_node_id, nodes, connections_by_source, node_id_to_label, ivr_flow, processed_nodes)
         
         # Process any remaining nodes
         for node_id in nodes:
             if node_id not in processed_nodes:
-                ivr_result = self._convert_node_to_ivr_flexible(node_id, nodes[node_id], connections, node_id_to_label)
+                ivr_result = self._convert_node_to_ivr_flexible(node_id, nodes[node_id], connections_by_source.get(node_id, ()), node_id_to_label)
                 # Handle multi-section nodes (like welcome nodes with multiple sections)
                 if isinstance(ivr_result, list):
                     ivr_flow.extend(ivr_result)
@@ -575,62 +1360,61 @@ class FlexibleARCOSConverter:
         print(f"SUCCESS: Flexible conversion completed! Generated {len(ivr_flow)} nodes")
         return ivr_flow, js_output
 
-    def _parse_mermaid_enhanced(self, mermaid_code: str) -> Tuple[Dict[str, str], List[Dict]]:
+    def _parse_mermaid_enhanced(self, mermaid_code: str) -> Tuple[Dict[str, str], List[Connection]]:
         """Enhanced Mermaid parsing"""
         nodes = {}
         connections = []
         
         # Clean up the input
-        mermaid_code = re.sub(r'```.*?```', '', mermaid_code, flags=re.DOTALL)
-        mermaid_code = re.sub(r'flowchart\s+TD|graph\s+TD', '', mermaid_code)
-        
-        # Extract nodes
-        node_patterns = [
-            r'([A-Z]+)\["([^"]*?)"\]',           # A["text"]
-            r'([A-Z]+)\{([^}]*?)\}',             # A{text} - diamond
-            r'([A-Z]+)\[([^\]]*?)\]',            # A[text]
-            r'([A-Z]+)\(([^)]*?)\)',             # A(text) - rounded
-        ]
-        
-        for pattern in node_patterns:
-            for match in re.finditer(pattern, mermaid_code):
-                node_id = match.group(1)
-                node_text = match.group(2).replace('<br/>', '\n').replace('\\n', '\n')
-                nodes[node_id] = node_text.strip()
-        
-        # Extract connections - enhanced to handle node definitions in the same line
-        connection_patterns = [
-            # Handle lines with node definitions: A["text"] -->|"label"| B{"text"}
-            r'([A-Z]+)(?:\[.*?\]|\{.*?\})?\s*-->\s*\|"([^"]+)"\|\s*([A-Z]+)(?:\[.*?\]|\{.*?\})?',
-            # Handle lines with node definitions: A["text"] -->|label| B{"text"}  
-            r'([A-Z]+)(?:\[.*?\]|\{.*?\})?\s*-->\s*\|([^|]+)\|\s*([A-Z]+)(?:\[.*?\]|\{.*?\})?',
-            # Handle simple connections: A --> B
-            r'([A-Z]+)(?:\[.*?\]|\{.*?\})?\s*-->\s*([A-Z]+)(?:\[.*?\]|\{.*?\})?',
-        ]
-        
-        for pattern in connection_patterns:
-            for match in re.finditer(pattern, mermaid_code):
-                source = match.group(1)
-                if len(match.groups()) == 3:
-                    # Has label and target
-                    label = match.group(2)
-                    target = match.group(3)
-                else:
-                    # Direct connection without label
-                    label = ''
-                    target = match.group(2)
-                
-                connections.append({
-                    'source': source,
-                    'target': target,
-                    'label': label.strip()
-                })
+        mermaid_code = _CODE_FENCE.sub('', mermaid_code)
+        mermaid_code = _FLOWCHART_HEADER.sub('', mermaid_code)
+        
+        # Extract nodes - one scan over the source for all node shapes
+        first_seen = {}
+        text_from = {}
+        for match in _NODE_PATTERN.finditer(mermaid_code):
+            shape = match.lastgroup
+            node_id, node_text = match.group(1, shape)
+
+            order = _NODE_SHAPE_ORDER[shape]
+            # The original parser ran one pass per shape, so later passes overwrote the text
+            source = (order, match.start())
+            if shape == 'square' and node_text[:1] == '"' and _QUOTED_SQUARE_NODE.match(mermaid_code, match.start()):
+                order = 0  # A["text"], ranked by the whole quoted node rather than the text up to the first ]
+            position = (order, match.start())
+            seen_at = first_seen.get(node_id)
+            if seen_at is None or position < seen_at:
+                first_seen[node_id] = position
+            
+            text_at = text_from.get(node_id)
+            if text_at is not None and source < text_at:
+                continue
+            text_from[node_id] = source
+
+            # Most node texts carry no <br/> or literal \n - only run the substitution when one could match
+            if '<' in node_text or '\\' in node_text:
+                node_text = _LINE_BREAK.sub('\n', node_text)
+            nodes[node_id] = node_text.strip()
+
+        nodes = {node_id: nodes[node_id] for node_id in sorted(nodes, key=first_seen.__getitem__)}
+
+        # Extract connections - enhanced to handle node definitions in the same line.
+        # Repeated edges (same source, target and label) are kept once, in first-seen order.
+        seen_connections = set()
+        for match in _CONNECTION_PATTERN.finditer(mermaid_code):
+            source, quoted, plain, target = match.groups()
+            label = (quoted or plain or '').strip()
+            edge_key = (source, target, label)
+            if edge_key in seen_connections:
+                continue
+            seen_connections.add(edge_key)
+            connections.append(Connection(*edge_key, label.lower()))
         
         return nodes, connections
 
-    def _find_start_node(self, nodes: Dict[str, str], connections: List[Dict]) -> str:
-        """Find the starting node - FLEXIBLE approach"""
-        incoming_targets = {conn['target'] for conn in connections}
+    def _find_start_node(self, nodes: Dict[str, str], incoming_targets: set) -> str:
+        """Find the starting node (one without incoming edges) - FLEXIBLE approach"""
+        # Roots are the nodes no edge points at (incoming_targets is built once per conversion)
         start_candidates = [node_id for node_id in nodes if node_id not in incoming_targets]
         
         if start_candidates:
@@ -638,128 +1422,58 @@ class FlexibleARCOSConverter:
             for node_id in start_candidates:
                 text = nodes[node_id].lower()
                 # More flexible starting point detection
-                if any(indicator in text for indicator in [
-                    'welcome', 'this is', 'hello', 'greeting', 'start', 'begin',
-                    'please enter', 'enter your', 'pin not', 'invalid pin'
-                ]):
+                if _contains_any(text, _START_INDICATORS):
                     return node_id
             return start_candidates[0]
         
-        return list(nodes.keys())[0]
-
-    def _process_node_recursive(self, node_id: str, nodes: Dict[str, str], connections: List[Dict], 
-                               node_id_to_label: Dict[str, str], ivr_flow: List[Dict], processed: set):
-        """Process nodes recursively to maintain flow order"""
-        if node_id in processed or node_id not in nodes:
-            return
-        
-        processed.add(node_id)
-        
-        # Convert this node
-        ivr_result = self._convert_node_to_ivr_flexible(node_id, nodes[node_id], connections, node_id_to_label)
-        # Handle multi-section nodes (like welcome nodes with multiple sections)
-        if isinstance(ivr_result, list):
-            ivr_flow.extend(ivr_result)
-        else:
-            ivr_flow.append(ivr_result)
-        
-        # Process connected nodes
-        outgoing_connections = [conn for conn in connections if conn['source'] == node_id]
-        for conn in outgoing_connections:
-            self._process_node_recursive(conn['target'], nodes, connections, node_id_to_label, ivr_flow, processed)
+        return next(iter(nodes))
 
-    def _generate_flexible_label(self, node_text: str, node_id: str) -> str:
-        """FLEXIBLE label generation - works for ANY flow type"""
-        text_lower = node_text.lower().strip()
-        
-        # Special IVR label patterns based on developer feedback and allflows LITE
-        ivr_label_patterns = [
-            # Welcome/main entry node patterns (critical fix)
-            (r'welcome.*this is an.*electric callout.*press 1', 'Live Answer'),
-            (r'this is an.*electric callout.*press 1', 'Live Answer'), 
-            (r'electric callout.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
-            (r'press 1.*press 3.*press 7.*press 9', 'Live Answer'),
-            # Additional patterns for electric callout welcome
-            (r'this is an electric callout from.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
-            (r'welcome.*press 1.*press 3.*press 7.*press 9', 'Live Answer'),
-            
-            # Core IVR patterns
-            (r'notification.*callout', 'Callout'),
-            (r'custom\s+message', 'Custom Message'),
-            (r'confirm.*receipt', 'Offer'),  # "Confirm" becomes "Offer" per developer feedback
-            (r'accepted?\s+response', 'Accept'),
-            (r'invalid\s+entry', 'Invalid Entry'),
-            (r'disconnect', 'Hangup'),
-            (r'main\s+menu', 'Main Menu'),
-            
-            # PIN related
-            (r'enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Enter PIN'),
-            (r'please\s+enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Enter PIN'),
-            (r're-enter\s+(?:your\s+)?(?:new\s+)?(?:four\s+digit\s+)?pin', 'Re-enter PIN'),
-            (r'pin\s+(?:cannot\s+be|not)', 'PIN Restriction'),
-            (r'pin\s+(?:has\s+been\s+)?changed', 'PIN Changed'),
-            (r'new\s+pin', 'New PIN'),
+    def _process_nodes_in_flow_order(self, start_node_id: str, nodes: Dict[str, str], connections_by_source: Dict[str, List[Connection]], 
+                                     node_id_to_label: Dict[str, str], ivr_flow: List[Dict], processed: set) -> None:
+        """Process nodes depth-first from the start node to maintain flow order"""
+        # Explicit stack instead of recursion - long linear flows can't hit the recursion limit.
+        # Targets are pushed in reverse so they are visited in connection order.
+        stack = [start_node_id]
+        while stack:
+            node_id = stack.pop()
+            if node_id in processed or node_id not in nodes:
+                continue
             
-            # Entry and validation
-            (r'invalid\s+entry', 'Invalid Entry'),
-            (r'invalid\s+(\w+)', r'Invalid \1'),
-            (r'entered\s+digits', 'Entered Digits'),
-            (r'valid\s+digits', 'Valid Digits'),
+            processed.add(node_id)
             
-            # Name related
-            (r'name\s+(?:has\s+been\s+)?confirmation', 'Name Confirmation'),
-            (r'name\s+(?:has\s+been\s+)?recorded', 'Name Recorded'),
-            (r'name\s+(?:has\s+been\s+)?changed', 'Name Changed'),
-            (r'first\s+time\s+users', 'First Time Users'),
-            (r'automated\s+system\s+needs', 'Name Recording'),
+            # Convert this node (leaf nodes share an empty tuple instead of growing the index)
+            outgoing_connections = connections_by_source.get(node_id, ())
+            ivr_result = self._convert_node_to_ivr_flexible(node_id, nodes[node_id], outgoing_connections, node_id_to_label)
+            # Handle multi-section nodes (like welcome nodes with multiple sections)
+            if isinstance(ivr_result, list):
+                ivr_flow.extend(ivr_result)
+            else:
+                ivr_flow.append(ivr_result)
             
-            # General patterns
-            (r'employee\s+information', 'Employee Information'),
-            (r'selection', 'Selection'),
-            (r'match\s+to\s+first\s+entry', 'Match Check'),
-            (r'your\s+(\w+)\s+(?:has\s+been\s+)?(?:successfully\s+)?changed', r'\1 Changed'),
-            (r'please\s+(\w+)', r'\1'),
-            (r'(\w+)\s+successfully', r'\1 Success'),
-        ]
-        
-        # Handle questions/decisions dynamically
-        if '?' in node_text:
-            # Extract the question and make it a label
-            question = node_text.split('?')[0].strip()
-            # Take key words from the question
-            key_words = [word for word in question.split() if len(word) > 2 and word.lower() not in ['the', 'to', 'is', 'was', 'are', 'were']]
-            if key_words:
-                return ' '.join(key_words[:3]).title()
-        
-        for pattern, replacement in ivr_label_patterns:
-            match = re.search(pattern, text_lower, re.DOTALL)
-            if match:
-                if r'\1' in replacement:
-                    return replacement.replace(r'\1', match.group(1).title())
-                else:
-                    return replacement
-        
-        # Extract meaningful words from the beginning
-        words = re.findall(r'\b[A-Za-z]+\b', node_text)
-        meaningful_words = [word for word in words if len(word) > 2 and word.lower() not in ['the', 'your', 'this', 'that', 'please', 'has', 'been', 'will', 'are', 'is']]
-        
-        if meaningful_words:
-            return ' '.join(meaningful_words[:2]).title()
-        
-        # Last resort - first few words
-        first_words = node_text.split()[:2]
-        if first_words:
-            return ' '.join(word.capitalize() for word in first_words)
-        
-        return f"Node_{node_id}"
+            # Process connected nodes - targets already converted would only be popped and skipped
+            stack.extend(conn.target for conn in reversed(outgoing_connections) if conn.target not in processed)
 
-    def _convert_node_to_ivr_flexible(self, node_id: str, node_text: str, connections: List[Dict], 
+    def _generate_flexible_label(self, node_text: str, node_id: str) -> str:
+        """FLEXIBLE label generation - works for ANY flow type"""
+        return _label_from_text(node_text) or f"Node_{node_id}"
+
+    def _convert_node_to_ivr_flexible(self, node_id: str, node_text: str, node_connections: List[Connection], 
                                      node_id_to_label: Dict[str, str]) -> Any:
         """FLEXIBLE node conversion - works for ANY flow type"""
         
-        node_connections = [conn for conn in connections if conn['source'] == node_id]
         meaningful_label = node_id_to_label[node_id]
         
+        # FLEXIBLE node type detection
+        text_lower = node_text.lower()
+        node_type = self._detect_node_type_flexible(node_text, node_connections, text_lower)
+        
+        builder = self._node_builders.get(node_type)
+        
+        if node_type == 'welcome':
+            # Welcome/greeting node - PRODUCTION MULTI-SECTION approach
+            # The builder emits its own sections, so no base node is built for it
+            return builder(node_text, node_connections, node_id_to_label, text_lower)
+        
         # Base node structure
         ivr_node = {
             "label": meaningful_label
@@ -779,55 +1493,37 @@ class FlexibleARCOSConverter:
             # Fallback to simple log
             ivr_node["log"] = f"{node_text.replace('\n', ' ')[:80]}..."
         
-        # FLEXIBLE node type detection
-        node_type = self._detect_node_type_flexible(node_text, node_connections)
-        
-        if node_type == 'decision':
-            # Decision node - needs branches
-            decision_data = self._create_decision_node_flexible(node_text, node_connections, node_id_to_label)
+        if builder is not None:
+            node_data = builder(node_text, node_connections, node_id_to_label, text_lower)
             
             # SYSTEMATIC: Handle loop control decisions
-            if isinstance(decision_data, dict) and decision_data.get('loop_control'):
-                print("SYSTEMATIC: Converting loop control decision to maxLoop logic")
+            if node_type == 'decision' and node_data.get('loop_control'):
+                logger.debug("SYSTEMATIC: Converting loop control decision to maxLoop logic")
                 # This is a loop control node - we need to apply maxLoop to the source node
                 # Store loop information for later processing
                 loop_info = {
-                    'type': decision_data['loop_type'],
-                    'target': decision_data.get('loop_target'),
-                    'exit': decision_data.get('exit_target', 'Goodbye')
+                    'type': node_data['loop_type'],
+                    'target': node_data.get('loop_target'),
+                    'exit': node_data.get('exit_target', 'Goodbye')
                 }
                 # Mark this node for special processing
                 ivr_node["_loop_control"] = loop_info
                 # Don't add regular branch logic for loop control nodes
                 return ivr_node
-            else:
-                ivr_node.update(decision_data)
+            
+            # Decision, input and menu nodes - branches and getDigits
+            ivr_node.update(node_data)
             
             # Special handling for employee verification decision nodes
-            if any(pattern in node_text.lower() for pattern in ['this is employee', 'this is the employee', 'employee verification', 'verify employee']):
+            if node_type == 'decision' and _is_employee_verification(text_lower):
                 # Override prompts and logs for proper employee verification question
                 ivr_node["playPrompt"] = ["callflow:1002"]  # Generic question prompt
                 ivr_node["playLog"] = ["Is this the employee?"]
                 ivr_node["log"] = "Employee verification - Is this the employee?"
         
-        elif node_type == 'input':
-            # Input collection node
-            ivr_node.update(self._create_input_node_flexible(node_text, node_connections, node_id_to_label))
-        
-        elif node_type == 'menu':
-            # Main Menu node - needs getDigits for user input
-            menu_data = self._create_menu_node_flexible(node_text, node_connections, node_id_to_label)
-            ivr_node.update(menu_data)
-        
-        elif node_type == 'welcome':
-            # Welcome/greeting node - PRODUCTION MULTI-SECTION approach
-            welcome_sections = self._create_welcome_node_flexible(node_text, node_connections, node_id_to_label)
-            # Return the sections as separate nodes for production-style structure
-            return welcome_sections
-        
         elif len(node_connections) == 1:
             # Single connection - check if it's a page reference
-            target_label = node_id_to_label.get(node_connections[0]['target'], 'hangup')
+            target_label = node_id_to_label.get(node_connections[0].target, 'hangup')
             page_ref = detect_page_reference(target_label)
             
             if page_ref and page_ref.isdigit():
@@ -846,182 +1542,194 @@ class FlexibleARCOSConverter:
             ivr_node["goto"] = "hangup"
         
         # Add special IVR attributes based on node content
-        self._add_special_ivr_attributes(ivr_node, node_text, meaningful_label, node_type)
+        self._add_special_ivr_attributes(ivr_node, node_text, meaningful_label, node_type, text_lower)
         
         # Add conditional logic patterns (PRODUCTION FEATURE)
-        self._add_conditional_logic(ivr_node, node_text, meaningful_label)
+        self._add_conditional_logic(ivr_node, node_text, meaningful_label, text_lower)
         
         # Add confirmation patterns for critical actions (PRODUCTION FEATURE)
-        confirmation_nodes = self._generate_confirmation_patterns(ivr_node, node_text, meaningful_label)
+        confirmation_nodes = self._generate_confirmation_patterns(ivr_node, node_text, meaningful_label, text_lower)
         if confirmation_nodes:
             return confirmation_nodes
         
         # Add response handling for specific types
-        if any(word in node_text.lower() for word in ['accept', 'decline', 'recorded', 'successfully']):
-            if 'accept' in node_text.lower():
+        if _contains_any(text_lower, _RESPONSE_WORDS):
+            if 'accept' in text_lower:
                 # Simple gosub structure matching allflows LITE format
                 ivr_node["gosub"] = ["SaveCallResult", 1001, "Accept"]
-            elif 'decline' in node_text.lower():
+            elif 'decline' in text_lower:
                 ivr_node["gosub"] = ["SaveCallResult", 1002, "Decline"]
-            elif 'qualified' in node_text.lower():
+            elif 'qualified' in text_lower:
                 ivr_node["gosub"] = ["SaveCallResult", 1145, "QualNo"]
         
         return ivr_node
 
-    def _add_special_ivr_attributes(self, ivr_node: Dict, node_text: str, label: str, node_type: str):
+    def _add_special_ivr_attributes(self, ivr_node: Dict, node_text: str, label: str, node_type: str,
+                                    text_lower: Optional[str] = None) -> None:
         """Add special IVR attributes based on node content and type"""
-        text_lower = node_text.lower()
+        if text_lower is None:
+            text_lower = node_text.lower()
         
         # Add nobarge for message/notification nodes
-        if any(phrase in text_lower for phrase in ['notification', 'message', 'important', 'listen carefully']):
+        if _contains_any(text_lower, _NOBARGE_PHRASES):
             ivr_node["nobarge"] = 1
         
         # Add maxLoop for welcome/main nodes (matching allflows LITE pattern)
-        if 'welcome' in label.lower() or 'live answer' in label.lower() or any(phrase in text_lower for phrase in ['this is an', 'electric callout', 'press 1']):
+        label_lower = label.lower()
+        if 'welcome' in label_lower or 'live answer' in label_lower or _contains_any(text_lower, _MAIN_LOOP_PHRASES):
             # Main loop with 3 tries then go to Problems
             ivr_node["maxLoop"] = ["Main", 3, "Problems"]
         
         # Add maxLoop for recursive/callout nodes
-        elif any(phrase in text_lower for phrase in ['callout', 'notification']) and 'message' in text_lower:
+        elif _contains_any(text_lower, _CALLOUT_PHRASES) and 'message' in text_lower:
             # Based on developer feedback: on 4th try make them accept
             ivr_node["maxLoop"] = ["PLAYMESSAGE", 3, "Accept-1025"]
         
         # Add returnsub for inbound flows (based on developer feedback)
-        if 'accept' in text_lower and any(phrase in text_lower for phrase in ['receipt', 'message']):
+        if 'accept' in text_lower and _contains_any(text_lower, _RETURNSUB_PHRASES):
             ivr_node["returnsub"] = 1
         
         # Enhanced error handling patterns (PRODUCTION FEATURE)
-        self._add_enhanced_error_handling(ivr_node, node_text, label, node_type)
+        self._add_enhanced_error_handling(ivr_node, node_text, label, node_type, text_lower)
 
-    def _detect_node_type_flexible(self, node_text: str, connections: List[Dict]) -> str:
+    def _detect_node_type_flexible(self, node_text: str, connections: List[Connection],
+                                   text_lower: Optional[str] = None) -> str:
         """SYSTEMATIC node type detection with connection analysis"""
-        text_lower = node_text.lower()
+        if text_lower is None:
+            text_lower = node_text.lower()
         
         # SYSTEMATIC: Check connection labels for input patterns
+        # One pass over the node's edges counts direct (unlabeled) edges and looks for input labels
         has_input_connection = False
-        has_multiple_direct_connections = len([c for c in connections if not c.get('label', '').strip()]) > 2
+        direct_connection_count = 0
         
         for conn in connections:
-            label = conn.get('label', '').lower()
-            if 'input' in label and any(char.isdigit() for char in label):
-                has_input_connection = True
-                print(f"SYSTEMATIC: Detected input connection pattern: {label}")
-                break
+            if not conn.label:
+                direct_connection_count += 1
+                continue
+            if not has_input_connection:
+                label = conn.label_lower
+                if 'input' in label and _ANY_DIGIT.search(label):
+                    has_input_connection = True
+                    logger.debug("SYSTEMATIC: Detected input connection pattern: %s", label)
+        
+        has_multiple_direct_connections = direct_connection_count > 2
         
         # SYSTEMATIC: Input detection - either text patterns or connection patterns
-        if any(phrase in text_lower for phrase in ['enter your', 'please enter', 're-enter', 'followed by']):
+        if _contains_any(text_lower, _INPUT_PHRASES):
             return 'input'
         elif has_input_connection:
             return 'input'  # Node has input connection pattern
         
+        # Digits offered as "press N" - collected once for the welcome/menu/decision checks below
+        press_options = set(_PRESS_OPTION.findall(text_lower)) if 'press ' in text_lower else ()
+        
         # Welcome/main entry detection (critical for electric callout)
-        if ('press 1' in text_lower and 'press 3' in text_lower and 'press 7' in text_lower and 'press 9' in text_lower):
+        if _WELCOME_PRESS_OPTIONS.issubset(press_options):
             return 'welcome'  # This is the main welcome node with all DTMF options
         elif has_multiple_direct_connections:
             return 'welcome'  # Node with multiple direct connections is likely a welcome/menu
         
         # Main Menu detection - menu with press options but not the main welcome
-        if ('press 1' in text_lower and 'press 2' in text_lower and 'press 3' in text_lower) or \
-           ('press 1' in text_lower and 'press 2' in text_lower and 'press 4' in text_lower) or \
+        if (_MENU_PRESS_OPTIONS.issubset(press_options) and ('3' in press_options or '4' in press_options)) or \
            'main menu' in text_lower:
             return 'menu'
         
         # Decision indicators - check for press options with multiple choices
-        if ('press 1' in text_lower and 'press 3' in text_lower) or 'confirm' in text_lower:
+        if _DECISION_PRESS_OPTIONS.issubset(press_options) or 'confirm' in text_lower:
             return 'decision'
         
         # Decision indicators
-        if '?' in node_text or any(word in text_lower for word in ['match', 'valid', 'correct', 'entered digits']):
+        if '?' in node_text or _contains_any(text_lower, _DECISION_WORDS):
             return 'decision'
         
         # Welcome indicators (flexible) - callout pattern with connections
-        if any(phrase in text_lower for phrase in ['welcome', 'this is.*callout', 'hello', 'greeting']) and len(connections) > 2:
+        if _contains_any(text_lower, _WELCOME_PHRASES) and len(connections) > 2:
             return 'welcome'
         
         # Employee verification decision nodes (CRITICAL FIX for choice 1 mapping)
         # This catches patterns like "1 - this is employee" which should ask "Is this the employee?"
-        if any(pattern in text_lower for pattern in ['this is employee', 'this is the employee', 'employee verification', 'verify employee']):
+        if _is_employee_verification(text_lower):
             return 'decision'
         
         # Additional verification patterns that require yes/no responses
-        if any(pattern in text_lower for pattern in ['this is', 'are you', 'is this']) and 'employee' in text_lower:
+        if _contains_any(text_lower, _VERIFICATION_QUESTIONS) and 'employee' in text_lower:
             return 'decision'
         
         # Default
         return 'message'
 
-    def _create_decision_node_flexible(self, text: str, connections: List[Dict], node_id_to_label: Dict[str, str]) -> Dict:
+    def _create_decision_node_flexible(self, text: str, connections: List[Connection], node_id_to_label: Dict[str, str],
+                                       text_lower: Optional[str] = None) -> Dict:
         """Create decision node - SYSTEMATIC approach for all patterns"""
         branch_map = {}
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
-        print(f"PROCESSING: Decision node processing {len(connections)} connections...")
+        logger.debug("PROCESSING: Decision node processing %s connections...", len(connections))
         
         # SYSTEMATIC: Detect loop control patterns
-        is_loop_control = any(pattern in text_lower for pattern in [
-            'played', 'times', 'loop', 'repeat', 'again', 'tries', 'attempts'
-        ])
+        is_loop_control = _contains_any(text_lower, _LOOP_CONTROL_WORDS)
         
         # SYSTEMATIC: Detect employee verification patterns  
-        is_employee_verification = any(pattern in text_lower for pattern in [
-            'this is employee', 'this is the employee', 'employee verification', 'verify employee'
-        ])
+        is_employee_verification = _is_employee_verification(text_lower)
         
-        print(f"DETECTED: Loop control: {is_loop_control}, Employee verification: {is_employee_verification}")
+        logger.debug("DETECTED: Loop control: %s, Employee verification: %s", is_loop_control, is_employee_verification)
         
         # SYSTEMATIC: Handle loop control nodes specially
         if is_loop_control:
-            print("SYSTEMATIC: Processing loop control decision - converting to maxLoop logic")
+            logger.debug("SYSTEMATIC: Processing loop control decision - converting to maxLoop logic")
             # For loop control nodes, we typically want to return a special marker
             # The calling code should detect this and add maxLoop to the source node
             return {
                 "loop_control": True,
                 "loop_type": "answering_machine" if "played" in text_lower else "retry",
-                "loop_target": connections[0]['target'] if connections else None,
-                "exit_target": connections[1]['target'] if len(connections) > 1 else "Goodbye"
+                "loop_target": connections[0].target if connections else None,
+                "exit_target": connections[1].target if len(connections) > 1 else "Goodbye"
             }
         
         # Map connections based on labels
         for conn in connections:
-            label = conn.get('label', '').lower()
-            target_label = node_id_to_label.get(conn['target'], 'hangup')
+            label = conn.label_lower
+            target_label = node_id_to_label.get(conn.target, 'hangup')
+            target_lower = target_label.lower()
             
-            print(f"CONNECTING: Processing decision connection: '{label}' -> {target_label}")
+            logger.debug("CONNECTING: Processing decision connection: '%s' -> %s", label, target_label)
             
             # SYSTEMATIC: Handle employee verification nodes - USE NUMERIC KEYS
             if is_employee_verification:
                 # Employee verification should use DTMF numeric keys, not yes/no
                 if 'yes' in label or '1' in label:
                     branch_map['1'] = target_label
-                    print(f"MAPPED: Employee verification 1 (yes) -> {target_label}")
+                    logger.debug("MAPPED: Employee verification 1 (yes) -> %s", target_label)
                 elif 'no' in label or '0' in label or 'retry' in label:
                     branch_map['0'] = target_label
-                    print(f"MAPPED: Employee verification 0 (no) -> {target_label}")
+                    logger.debug("MAPPED: Employee verification 0 (no) -> %s", target_label)
                 continue
             
             # Enhanced branch mapping based on developer feedback
             # Check the target node to determine correct mapping
-            target_node_text = conn['target']
+            target_node_text = conn.target
             
-            if 'accept' in label and 'accept' in target_label.lower():
+            if 'accept' in label and 'accept' in target_lower:
                 branch_map['1'] = target_label
-                print(f"MAPPED: Choice 1 (accept) -> {target_label}")
+                logger.debug("MAPPED: Choice 1 (accept) -> %s", target_label)
             elif 'repeat' in label or ('3' in label and 'repeat' in label):
                 branch_map['3'] = target_label
-                print(f"MAPPED: Choice 3 (repeat) -> {target_label}")
-            elif '1' in label and ('accept' in target_label.lower() or 'response' in target_label.lower()):
+                logger.debug("MAPPED: Choice 3 (repeat) -> %s", target_label)
+            elif '1' in label and ('accept' in target_lower or 'response' in target_lower):
                 branch_map['1'] = target_label
-                print(f"MAPPED: Choice 1 -> {target_label}")
-            elif '3' in label and ('custom' in target_label.lower() or 'message' in target_label.lower()):
+                logger.debug("MAPPED: Choice 1 -> %s", target_label)
+            elif '3' in label and ('custom' in target_lower or 'message' in target_lower):
                 branch_map['3'] = target_label
-                print(f"MAPPED: Choice 3 -> {target_label}")
+                logger.debug("MAPPED: Choice 3 -> %s", target_label)
             elif 'invalid' in label or 'no input' in label:
                 branch_map['error'] = target_label
                 branch_map['none'] = target_label
-                print(f"MAPPED: Error/None -> {target_label}")
+                logger.debug("MAPPED: Error/None -> %s", target_label)
             elif 'retry' in label:
                 branch_map['error'] = target_label
-                print(f"MAPPED: Error (retry) -> {target_label}")
+                logger.debug("MAPPED: Error (retry) -> %s", target_label)
             elif 'yes' in label:
                 branch_map['yes'] = target_label
             elif 'no' in label:
@@ -1033,11 +1741,11 @@ class FlexibleARCOSConverter:
         if 'none' not in branch_map:
             branch_map['none'] = 'Problems'
         
-        print(f"RESULT: Decision branch map: {branch_map}")
+        logger.debug("RESULT: Decision branch map: %s", branch_map)
         
         # Add getDigits configuration for proper DTMF collection
         # Extract valid choices from branch map (only numeric keys)
-        valid_choices = [key for key in branch_map.keys() if key.isdigit()]
+        valid_choices = join_dtmf_choices(branch_map)
         
         decision_node = {
             "branch": branch_map
@@ -1048,46 +1756,47 @@ class FlexibleARCOSConverter:
             decision_node["getDigits"] = {
                 "numDigits": 1,
                 "maxTime": 7,
-                "validChoices": "|".join(sorted(valid_choices)),
+                "validChoices": valid_choices,
                 "errorPrompt": "callflow:1009",
                 "nonePrompt": "callflow:1009"
             }
         
         return decision_node
 
-    def _create_input_node_flexible(self, text: str, connections: List[Dict], node_id_to_label: Dict[str, str]) -> Dict:
+    def _create_input_node_flexible(self, text: str, connections: List[Connection], node_id_to_label: Dict[str, str],
+                                    text_lower: Optional[str] = None) -> Dict:
         """Create input node - SYSTEMATIC approach"""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
         # SYSTEMATIC: Extract DTMF choices from connection labels first
-        input_choices = set()
+        # (every detected choice gets a branch, so branch_map's digit keys are the choices)
         branch_map = {}
         
         for conn in connections:
-            label = conn.get('label', '').strip()
-            target_label = node_id_to_label.get(conn['target'], 'hangup')
+            label = conn.label
+            target_label = node_id_to_label.get(conn.target, 'hangup')
             
-            print(f"SYSTEMATIC: Processing input connection: '{label}' -> {target_label}")
+            logger.debug("SYSTEMATIC: Processing input connection: '%s' -> %s", label, target_label)
             
             # Extract digits from input labels
-            if 'input' in label.lower():
+            if 'input' in conn.label_lower:
                 # Pattern like "Input - 1, 3, 7, or 9"
-                digits = re.findall(r'\b(\d)\b', label)
-                input_choices.update(digits)
-                print(f"SYSTEMATIC: Extracted DTMF choices from input: {digits}")
+                digits = _SINGLE_DIGIT.findall(label)
+                logger.debug("SYSTEMATIC: Extracted DTMF choices from input: %s", digits)
                 
                 # All these choices typically go to the same target in answering machine scenarios
                 for digit in digits:
                     branch_map[digit] = target_label
-                    print(f"MAPPED: Choice {digit} -> {target_label}")
+                    logger.debug("MAPPED: Choice %s -> %s", digit, target_label)
             elif label:
                 # Handle other labeled connections
-                digit_match = re.search(r'\b(\d)\b', label)
-                if digit_match:
-                    digit = digit_match.group(1)
-                    input_choices.add(digit)
+                digit = first_dtmf_digit(label)
+                if digit:
                     branch_map[digit] = target_label
-                    print(f"MAPPED: Choice {digit} (from label) -> {target_label}")
+                    logger.debug("MAPPED: Choice %s (from label) -> %s", digit, target_label)
+        
+        input_choices = join_dtmf_choices(branch_map)
         
         # SYSTEMATIC: Determine input configuration based on content analysis
         if 'pin' in text_lower:
@@ -1096,11 +1805,11 @@ class FlexibleARCOSConverter:
         elif input_choices:
             # Use the detected DTMF choices
             num_digits = 1
-            valid_choices = "|".join(sorted(input_choices))
-            print(f"SYSTEMATIC: Generated validChoices from connections: {valid_choices}")
+            valid_choices = input_choices
+            logger.debug("SYSTEMATIC: Generated validChoices from connections: %s", valid_choices)
         elif 'digit' in text_lower:
             # Extract number of digits
-            digit_match = re.search(r'(\d+)\s*digit', text_lower)
+            digit_match = _DIGIT_COUNT.search(text_lower)
             num_digits = int(digit_match.group(1)) if digit_match else 1
             valid_choices = "0|1|2|3|4|5|6|7|8|9"
         else:
@@ -1125,99 +1834,80 @@ class FlexibleARCOSConverter:
             "branch": branch_map
         }
 
-    def _create_welcome_node_flexible(self, text: str, connections: List[Dict], node_id_to_label: Dict[str, str]) -> List[Dict]:
+    def _create_welcome_node_flexible(self, text: str, connections: List[Connection], node_id_to_label: Dict[str, str],
+                                      text_lower: Optional[str] = None) -> List[Dict]:
         """Create welcome node - PRODUCTION MULTI-SECTION approach like real IVR scripts"""
         
         # Extract DTMF choices from the text
-        choices = re.findall(r'press\s+(\d+)', text.lower())
+        if text_lower is None:
+            text_lower = text.lower()
+        # Welcome nodes picked by edge count alone may have no "press" text to scan
+        choices = _PRESS_DIGITS.findall(text_lower) if 'press' in text_lower else None
         if not choices:
             choices = ['1', '3', '7', '9']  # Standard electric callout choices
         
         branch_map = {}
         
-        print(f"PROCESSING: Welcome node processing {len(connections)} connections...")
-        print(f"DETECTED: DTMF choices in text: {choices}")
+        logger.debug("PROCESSING: Welcome node processing %s connections...", len(connections))
+        logger.debug("DETECTED: DTMF choices in text: %s", choices)
         
         # SYSTEMATIC: Map connections based on actual diagram structure
         direct_connections = []  # For direct arrows without labels
         labeled_connections = []  # For labeled arrows
         
         for conn in connections:
-            label = conn.get('label', '').strip()
-            target_label = node_id_to_label.get(conn['target'], 'hangup')
+            label = conn.label
+            target_label = node_id_to_label.get(conn.target, 'hangup')
             
-            print(f"CONNECTING: Processing connection: '{label}' -> {target_label}")
+            logger.debug("CONNECTING: Processing connection: '%s' -> %s", label, target_label)
             
             if not label:
                 # Direct connection - these become menu choices automatically
-                direct_connections.append((target_label, conn['target']))
-                print(f"DETECTED: Direct connection -> {target_label}")
+                direct_connections.append((target_label, conn.target))
+                logger.debug("DETECTED: Direct connection -> %s", target_label)
             else:
-                labeled_connections.append((label.lower(), target_label))
-                print(f"DETECTED: Labeled connection '{label}' -> {target_label}")
+                labeled_connections.append((conn.label_lower, target_label))
+                logger.debug("DETECTED: Labeled connection '%s' -> %s", label, target_label)
         
         # SYSTEMATIC: Handle direct connections by assigning sequential numbers
         if direct_connections:
-            print(f"SYSTEMATIC: Processing {len(direct_connections)} direct connections as menu choices")
+            logger.debug("SYSTEMATIC: Processing %s direct connections as menu choices", len(direct_connections))
             for i, (target_label, target_id) in enumerate(direct_connections, 1):
                 if i <= 9:  # Limit to single digit choices
                     branch_map[str(i)] = target_label
-                    print(f"MAPPED: Choice {i} -> {target_label}")
+                    logger.debug("MAPPED: Choice %s -> %s", i, target_label)
         
         # SYSTEMATIC: Handle labeled connections with flexible parsing
         for label, target_label in labeled_connections:
             # Check for explicit DTMF numbers first
-            digit_match = re.search(r'\b(\d)\b', label)
-            if digit_match:
-                num = digit_match.group(1)
+            num = first_dtmf_digit(label)
+            if num:
                 branch_map[num] = target_label
-                print(f"MAPPED: Choice {num} (from label) -> {target_label}")
+                logger.debug("MAPPED: Choice %s (from label) -> %s", num, target_label)
                 continue
             
             # Handle special input patterns
             if label == 'input' or '"input"' in label or 'input - ' in label:
-                # Extract DTMF choices from input label
-                input_choices = re.findall(r'\b(\d)\b', label)
-                if input_choices:
-                    # Map each detected choice to the same target (common pattern)
-                    for choice in input_choices:
-                        branch_map[choice] = target_label
-                        print(f"MAPPED: Choice {choice} (from input) -> {target_label}")
-                else:
-                    # Default input mapping
-                    branch_map['1'] = target_label
-                    print(f"MAPPED: Choice 1 (default input) -> {target_label}")
+                # Any digit in the label was already taken by the search above,
+                # so a bare input label maps to the default choice
+                branch_map['1'] = target_label
+                logger.debug("MAPPED: Choice 1 (default input) -> %s", target_label)
                 continue
             
-            # Handle standard IVR patterns
-            if 'need more time' in label or 'time' in label:
-                branch_map['3'] = target_label
-                print(f"MAPPED: Choice 3 (need time) -> {target_label}")
-            elif 'not home' in label or 'home' in label:
-                branch_map['7'] = target_label
-                print(f"MAPPED: Choice 7 (not home) -> {target_label}")
-            elif 'repeat' in label or 'retry' in label:
-                branch_map['9'] = target_label
-                print(f"MAPPED: Choice 9 (repeat) -> {target_label}")
-            elif 'no input' in label or 'none' in label:
-                branch_map['error'] = target_label
-                print(f"MAPPED: No input -> {target_label}")
-            elif 'yes' in label:
-                branch_map['1'] = target_label
-                print(f"MAPPED: Choice 1 (yes) -> {target_label}")
-            elif 'no' in label:
-                branch_map['0'] = target_label
-                print(f"MAPPED: Choice 0 (no) -> {target_label}")
+            # Handle standard IVR patterns - first matching route wins
+            for keywords, choice in _WELCOME_LABEL_ROUTES:
+                if any(keyword in label for keyword in keywords):
+                    branch_map[choice] = target_label
+                    logger.debug("MAPPED: Choice %s (%s) -> %s", choice, label, target_label)
+                    break
         
         # Add required defaults matching allflows LITE pattern
         if 'error' not in branch_map:
             branch_map['error'] = 'Live Answer'  # Retry back to main menu
         
-        print(f"RESULT: Welcome branch map: {branch_map}")
+        logger.debug("RESULT: Welcome branch map: %s", branch_map)
         
         # Generate multi-section nodes like production scripts
-        welcome_sections = []
-        
         # Section 1: Main greeting with maxLoop
         prompts, logs = self._generate_flexible_prompts_and_logs(text, "Live Answer")
         
@@ -1227,24 +1917,14 @@ class FlexibleARCOSConverter:
             "playLog": logs[:3] if len(logs) >= 3 else logs,  # First few segments
             "playPrompt": prompts[:3] if len(prompts) >= 3 else prompts
         }
-        welcome_sections.append(section1)
         
         # Section 2: Environment check (production pattern)
-        section2 = {
-            "label": "Environment Check",
-            "log": "environment",
-            "playLog": ["Environment check"],
-            "guard": "function (){ return this.data.env!='prod' && this.data.env!='PROD' }",
-            "playPrompt": "callflow:{{env}}",
-            "nobarge": 1
-        }
-        welcome_sections.append(section2)
+        section2 = _copy_node_template(_ENVIRONMENT_CHECK_NODE_TEMPLATE)
         
         # SYSTEMATIC: Generate validChoices based on actual branch map
-        valid_dtmf_choices = [key for key in branch_map.keys() if key.isdigit()]
-        valid_choices_string = "|".join(sorted(valid_dtmf_choices)) if valid_dtmf_choices else "1|3|7|9"
+        valid_choices_string = join_dtmf_choices(branch_map) or "1|3|7|9"
         
-        print(f"SYSTEMATIC: Generated validChoices: {valid_choices_string}")
+        logger.debug("SYSTEMATIC: Generated validChoices: %s", valid_choices_string)
         
         # Section 3: Main choice menu with getDigits
         section3 = {
@@ -1261,22 +1941,23 @@ class FlexibleARCOSConverter:
             },
             "branch": branch_map
         }
-        welcome_sections.append(section3)
         
-        return welcome_sections
+        return [section1, section2, section3]
 
-    def _create_menu_node_flexible(self, text: str, connections: List[Dict], node_id_to_label: Dict[str, str]) -> Dict:
+    def _create_menu_node_flexible(self, text: str, connections: List[Connection], node_id_to_label: Dict[str, str],
+                                   text_lower: Optional[str] = None) -> Dict:
         """Create main menu node with proper getDigits"""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
         # Extract menu choices from text and connections
         branch_map = {}
-        valid_choices = []
+        valid_choices = set()
         
         # Analyze connections to determine valid choices and handle page references
         for conn in connections:
-            label = conn.get('label', '').lower()
-            target_label = node_id_to_label.get(conn['target'], conn['target'])
+            label = conn.label_lower
+            target_label = node_id_to_label.get(conn.target, conn.target)
             
             # Check if target is a page reference
             target_node_text = ''  # We'll need to get this from somewhere
@@ -1295,8 +1976,7 @@ class FlexibleARCOSConverter:
                     else:
                         branch_map[num] = target_label
                     
-                    if num not in valid_choices:
-                        valid_choices.append(num)
+                    valid_choices.add(num)
                     break
         
         # Add default branches
@@ -1306,10 +1986,9 @@ class FlexibleARCOSConverter:
             branch_map['none'] = 'Invalid Entry'
         
         # Always parse the text for press instructions to ensure we get all choices
-        text_choices = []
         for num in ['1', '2', '3', '4', '8']:
             if f'press {num}' in text_lower:
-                text_choices.append(num)
+                valid_choices.add(num)
                 
                 # Map to appropriate targets based on common patterns if not already mapped
                 if num not in branch_map:
@@ -1324,16 +2003,11 @@ class FlexibleARCOSConverter:
                     elif num == '8' and 'repeat' in text_lower:
                         branch_map[num] = 'Main Menu'  # Loop back to self
         
-        # Combine connection-based and text-based choices
-        all_choices = list(set(valid_choices + text_choices))
-        if all_choices:
-            valid_choices = all_choices
-        
-        # Determine valid choices string
+        # Determine valid choices string from connection-based and text-based choices
         if not valid_choices:
             # Default menu choices if none detected
-            valid_choices = ['1', '2', '3', '4', '8']
-        valid_choices_str = '|'.join(sorted(valid_choices))
+            valid_choices = {'1', '2', '3', '4', '8'}
+        valid_choices_str = join_dtmf_choices(valid_choices)
         
         return {
             "getDigits": {
@@ -1361,33 +2035,16 @@ class FlexibleARCOSConverter:
             segment_clean = segment.strip()
             if not segment_clean:
                 continue
-                
-            # Check for template variable patterns first (PRODUCTION FEATURE)
-            template_result = self._generate_template_variables(segment_clean, label)
-            if template_result:
-                prompts.extend(template_result['prompts'])
-                logs.extend(template_result['logs'])
-                continue
-                
-            # Find best match for this segment
-            best_match = self._find_best_match_flexible(segment_clean)
-            if best_match:
-                prompts.append(f"callflow:{best_match}")
-                logs.append(segment_clean)
-            else:
-                # Check for custom message patterns
-                if 'custom message' in segment_clean.lower():
-                    prompts.append("custom:{{custom_message}}")
-                    logs.append("[Custom Message]")
-                elif segment_clean:
-                    prompts.append("[VOICE FILE NEEDED]")
-                    logs.append(segment_clean)
+            
+            segment_prompts, segment_logs = self._segment_prompts_and_logs(segment_clean, label)
+            prompts.extend(segment_prompts)
+            logs.extend(segment_logs)
         
         # If no segments found or matched, fallback to original logic
         if not prompts:
             best_match = self._find_best_match_flexible(text)
             if best_match:
-                prompts = [f"callflow:{best_match}"]
+                prompts = [_callflow_prompt(best_match)]
                 logs = [text.replace('\n', ' ').strip()]
             else:
                 prompts = ["[VOICE FILE NEEDED]"]
@@ -1395,186 +2052,47 @@ class FlexibleARCOSConverter:
         
         return prompts, logs
 
-    def _generate_template_variables(self, text: str, label: str) -> Optional[Dict[str, List[str]]]:
-        """Generate template variables and macros like production IVR scripts"""
-        text_lower = text.lower().strip()
-        
-        # Template variable patterns based on production scripts
-        template_patterns = [
-            # Employee name patterns
-            {
-                'pattern': r'if this is\s*\([^)]*employee[^)]*\)',
-                'prompts': ["callflow:1002", "names:{{contact_id}}"],
-                'logs': ["Press 1 if this is", "Employee name spoken({{contact_id}})"]
-            },
-            {
-                'pattern': r'employee[^)]*\)\s*is not home',
-                'prompts': ["names:{{contact_id}}", "callflow:1004"],
-                'logs': ["Employee name spoken", "is not home"]
-            },
-            {
-                'pattern': r'get\s*\([^)]*employee[^)]*\)\s*to the phone',
-                'prompts': ["names:{{contact_id}}", "callflow:1006"],
-                'logs': ["Employee name spoken", "to the phone"]
-            },
-            {
-                'pattern': r'please have[^)]*\([^)]*employee[^)]*\)',
-                'prompts': ["callflow:1017", "names:{{contact_id}}"],
-                'logs': ["Please have", "Employee name spoken"]
-            },
-            
-            # Location patterns
-            {
-                'pattern': r'electric callout from\s*\([^)]*level[^)]*\)',
-                'prompts': ["callflow:1614", "location:{{level1_location}}"],
-                'logs': ["This is an electric callout from", "Level location spoken"]
-            },
-            {
-                'pattern': r'call the[^)]*\([^)]*level[^)]*\)',
-                'prompts': ["callflow:1174", "location:{{level1_location}}"],
-                'logs': ["call the", "Level location spoken"]
-            },
-            
-            # Callout type patterns
-            {
-                'pattern': r'callout reason is\s*\([^)]*\)',
-                'prompts': ["callflow:1019", "reason:{{callout_reason}}"],
-                'logs': ["The callout reason is", "Callout reason spoken"]
-            },
-            {
-                'pattern': r'trouble location is\s*\([^)]*\)',
-                'prompts': ["callflow:1232", "location:{{callout_location}}"],
-                'logs': ["The trouble location is", "Trouble location spoken"]
-            },
-            
-            # Time/Date patterns
-            {
-                'pattern': r'initiated on.*speaks date.*speaks time',
-                'prompts': ["callflow:1014", "date:{{job_start_date}}", "callflow:1015", "time:{{job_start_time}}"],
-                'logs': ["callout was initiated on", "Speaks date", "at", "Speaks time"]
-            },
-            
-            # Phone number patterns
-            {
-                'pattern': r'call.*system.*at.*phone',
-                'prompts': ["callflow:1174", "callflow:1290", "callflow:1015", "digits:{{callback_number}}"],
-                'logs': ["call the", "callout system", "at", "speak phone number"]
-            },
-            
-            # Production patterns from lead programmer feedback
-            {
-                'pattern': r'this is a.*scheduled overtime.*callout from.*virginia american water',
-                'prompts': ["callflow:1210", "type:{{callout_type}}", "callflow:1192", "company:1201"],
-                'logs': ["This is a", "Scheduled Overtime", "callout from", "Virginia American Water"]
-            },
-            {
-                'pattern': r'it is.*current date and time',
-                'prompts': ["callflow:1231", "current: dow, date, time"],
-                'logs': ["It is", "Speak current date and time"]
-            },
-            {
-                'pattern': r'there is a.*callout.*scheduled for',
-                'prompts': ["callflow:1011", "company:{{company_id}}", "type:{{callout_type}}", "callflow:1274", "callflow:1400"],
-                'logs': ["There is a", "Company name", "Callout type", "callout", "scheduled for"]
-            },
-            {
-                'pattern': r'speaks dow.*speaks date.*speaks time',
-                'prompts': ["dow: {{job_start_date}}", "date: {{job_start_date}}", "time: {{job_start_time}}"],
-                'logs': ["Speaks dow of callout", "Speaks date of callout", "Speaks time of callout"]
-            },
-            {
-                'pattern': r'ending on.*end dow.*end date.*end time',
-                'prompts': ["callflow:1190", "dow: {{job_end_date}}", "date: {{job_end_date}}", "time: {{job_end_time}}"],
-                'logs': ["ending on", "Speaks end dow of callout", "Speaks end date of callout", "Speaks end time of callout"]
-            },
-            {
-                'pattern': r'the location of the work is',
-                'prompts': ["callflow:2808", "location:{{callout_location}}"],
-                'logs': ["The location of the work is", "Location spoken"]
-            },
-            {
-                'pattern': r'you are being called out as a',
-                'prompts': ["callflow:2145", "class:{{job_classification}}"],
-                'logs': ["You are being called out as a", "Job classification spoken"]
-            }
-        ]
-        
-        # Check for matches
-        for pattern_info in template_patterns:
-            if re.search(pattern_info['pattern'], text_lower):
-                return {
-                    'prompts': pattern_info['prompts'],
-                    'logs': pattern_info['logs']
-                }
+    def _segment_prompts_and_logs(self, segment: str, label: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Prompts and logs for one text segment, cached since segments repeat across nodes"""
+        cached = self._segment_cache.get(segment)
+        if cached is not None:
+            return cached
+        
+        segment_lower = segment.lower()
+        
+        # Check for template variable patterns first (PRODUCTION FEATURE)
+        template_rule = _match_template_variables(segment_lower)
+        if template_rule:
+            # Straight from the rule table into the cached tuples - no intermediate lists
+            result = (tuple(template_rule['prompts']), tuple(template_rule['logs']))
+        else:
+            # Find best match for this segment
+            best_match = self._find_best_match_flexible(segment)
+            if best_match:
+                result = ((_callflow_prompt(best_match),), (segment,))
+            # Check for custom message patterns
+            elif 'custom message' in segment_lower:
+                result = (("custom:{{custom_message}}",), ("[Custom Message]",))
+            else:
+                result = (("[VOICE FILE NEEDED]",), (segment,))
         
-        return None
+        _store_bounded(self._segment_cache, segment, result)
+        return result
 
-    def _add_conditional_logic(self, ivr_node: Dict, node_text: str, label: str):
+    def _add_conditional_logic(self, ivr_node: Dict, node_text: str, label: str,
+                               text_lower: Optional[str] = None) -> None:
         """Add conditional logic patterns like production IVR scripts"""
-        text_lower = node_text.lower().strip()
-        
-        # Conditional patterns based on production scripts
-        conditional_patterns = [
-            # PIN requirement check
-            {
-                'pattern': r'pin.*required|check.*pin|enter.*pin',
-                'branchOn': '{{pin_req}}',
-                'branch': {
-                    '1': 'Enter PIN',
-                    'next': 'After PIN'
-                }
-            },
-            
-            # Environment-based conditions
-            {
-                'pattern': r'environment|env.*prod|development',
-                'guard': 'function(){ return this.data.env!="prod" && this.data.env!="PROD" }',
-                'guardPrompt': 'callflow:{{env}}'
-            },
-            
-            # Custom message conditions
-            {
-                'pattern': r'custom.*message|play.*custom',
-                'guardPrompt': 'custom:{{custom_message}}'
-            },
-            
-            # Callout reason conditions
-            {
-                'pattern': r'callout.*reason|reason.*is',
-                'guardPrompt': 'reason:{{callout_reason}}'
-            },
-            
-            # Job classification conditions
-            {
-                'pattern': r'job.*classification|working.*as',
-                'guardPrompt': 'class:{{job_classification}}'
-            },
-            
-            # Location-based conditions
-            {
-                'pattern': r'trouble.*location|location.*is',
-                'guardPrompt': 'location:{{callout_location}}'
-            },
-            
-            # English-only conditions
-            {
-                'pattern': r'english.*only|en.*only',
-                'branchOn': '{{en_only}}',
-                'branch': {
-                    '1': 'Problems EnOnly',
-                    'next': 'Problems Employee'
-                }
-            }
-        ]
+        if text_lower is None:
+            text_lower = node_text.lower().strip()
         
         # Check for conditional patterns
-        for pattern_info in conditional_patterns:
-            if re.search(pattern_info['pattern'], text_lower):
+        for pattern_info in _CONDITIONAL_PATTERNS:
+            if pattern_info['pattern'].search(text_lower):
                 # Add branchOn conditional
                 if 'branchOn' in pattern_info:
                     ivr_node['branchOn'] = pattern_info['branchOn']
                     if 'branch' in pattern_info:
-                        ivr_node['branch'] = pattern_info['branch']
+                        ivr_node['branch'] = dict(pattern_info['branch'])
                 
                 # Add guard function
                 if 'guard' in pattern_info:
@@ -1586,45 +2104,15 @@ class FlexibleARCOSConverter:
                 
                 break  # Use first match
 
-    def _generate_confirmation_patterns(self, ivr_node: Dict, node_text: str, label: str) -> Optional[List[Dict]]:
+    def _generate_confirmation_patterns(self, ivr_node: Dict, node_text: str, label: str,
+                                        text_lower: Optional[str] = None) -> Optional[List[Dict]]:
         """Generate confirmation patterns for critical actions like production scripts"""
-        text_lower = node_text.lower().strip()
-        
-        # Critical actions that need confirmation
-        critical_patterns = [
-            {
-                'trigger': r'accept.*callout|available.*to.*work',
-                'action': 'Accept',
-                'choice': '1',
-                'confirm_text': 'You pressed 1 to accept. Please press 1 again to confirm',
-                'confirm_prompt': 'callflow:1366'
-            },
-            {
-                'trigger': r'decline.*callout|not.*available',
-                'action': 'Decline', 
-                'choice': '9',
-                'confirm_text': 'You pressed 9 to decline. Please press 9 again to confirm',
-                'confirm_prompt': 'callflow:2135'
-            },
-            {
-                'trigger': r'supervisor.*acknowledgement|supervisor.*only',
-                'action': 'Supervisor',
-                'choice': '3', 
-                'confirm_text': 'You pressed 3. This is for supervisors only. Press 3 again to confirm',
-                'confirm_prompt': 'callflow:2137'
-            },
-            {
-                'trigger': r'qualified.*no|call.*again',
-                'action': 'QualNo',
-                'choice': '7',
-                'confirm_text': 'You pressed 7 to be called again. Please press 7 again to confirm', 
-                'confirm_prompt': 'callflow:2136'
-            }
-        ]
+        if text_lower is None:
+            text_lower = node_text.lower().strip()
         
         # Check if this node needs confirmation
-        for pattern_info in critical_patterns:
-            if re.search(pattern_info['trigger'], text_lower):
+        for pattern_info in _CONFIRMATION_PATTERNS:
+            if pattern_info['trigger'].search(text_lower):
                 # Generate confirmation pattern nodes
                 confirmation_nodes = []
                 
@@ -1657,71 +2145,24 @@ class FlexibleARCOSConverter:
                 confirmation_nodes.append(confirm_node)
                 
                 # Invalid response handler
-                invalid_node = {
-                    'label': 'Invalid_Response',
-                    'log': 'Invalid entry. Please try again',
-                    'playPrompt': ['callflow:1009'],
-                    'playLog': ['Invalid entry. Please try again'],
-                    'maxLoop': ['Loop-D', 3, 'Problems'],
-                    'goto': 'Offer',
-                    'nobarge': 1
-                }
-                confirmation_nodes.append(invalid_node)
+                confirmation_nodes.append(_copy_node_template(_INVALID_RESPONSE_NODE_TEMPLATE))
                 
                 return confirmation_nodes
         
         return None
 
-    def _add_enhanced_error_handling(self, ivr_node: Dict, node_text: str, label: str, node_type: str):
+    def _add_enhanced_error_handling(self, ivr_node: Dict, node_text: str, label: str, node_type: str,
+                                     text_lower: Optional[str] = None) -> None:
         """Add enhanced error handling patterns like production scripts"""
-        text_lower = node_text.lower().strip()
-        
-        # Error handling patterns based on production scripts
-        error_patterns = [
-            # Input validation errors
-            {
-                'trigger': r'invalid.*entry|invalid.*input|try.*again',
-                'maxLoop': ['Loop-Invalid Entry', 5, 'Problems'],
-                'errorPrompt': 'callflow:1009',
-                'nonePrompt': 'callflow:1009',
-                'nobarge': 1
-            },
-            
-            # PIN entry errors
-            {
-                'trigger': r'pin.*incorrect|wrong.*pin|invalid.*pin',
-                'maxLoop': ['Loop-PIN', 3, 'Problems'],
-                'errorPrompt': 'callflow:1009',
-                'nonePrompt': 'callflow:1009'
-            },
-            
-            # Offer retry patterns
-            {
-                'trigger': r'offer.*retry|retry.*offer|try.*again.*offer',
-                'maxLoop': ['Loop-E', 3, 'Problems'],
-                'resetLoop': 'Main'
-            },
-            
-            # Decision retry patterns
-            {
-                'trigger': r'confirm.*retry|confirmation.*error',
-                'maxLoop': ['Loop-F', 3, 'Problems']
-            },
-            
-            # Transfer failure patterns
-            {
-                'trigger': r'transfer.*failed|unable.*transfer',
-                'errorPrompt': 'callflow:1353',
-                'goto': 'Problems'
-            }
-        ]
+        if text_lower is None:
+            text_lower = node_text.lower().strip()
         
         # Apply error handling patterns
-        for pattern_info in error_patterns:
-            if re.search(pattern_info['trigger'], text_lower):
+        for pattern_info in _ERROR_HANDLING_PATTERNS:
+            if pattern_info['trigger'].search(text_lower):
                 # Add maxLoop for retry logic
                 if 'maxLoop' in pattern_info:
-                    ivr_node['maxLoop'] = pattern_info['maxLoop']
+                    ivr_node['maxLoop'] = list(pattern_info['maxLoop'])
                 
                 # Add error prompts
                 if 'errorPrompt' in pattern_info:
@@ -1767,23 +2208,17 @@ class FlexibleARCOSConverter:
     def _split_text_into_segments(self, text: str) -> List[str]:
         """Split text into logical segments for voice file matching"""
         # Remove HTML breaks and normalize
-        text = text.replace('<br/>', '\n').replace('\\n', '\n')
+        text = _LINE_BREAK.sub('\n', text)
         
-        # Clean up quotes and formatting
-        text = text.replace('"', '').replace('\\', '')
+        # Clean up quotes and formatting in one pass
+        text = text.translate(_SEGMENT_STRIP)
         
-        # Split by newlines first
+        # Split by newlines and sentence-ending punctuation in a single scan
         segments = []
-        for line in text.split('\n'):
-            line = line.strip()
-            if line:
-                # Further split by sentence-ending punctuation
-                import re
-                sentence_parts = re.split(r'[.!?]+', line)
-                for part in sentence_parts:
-                    part = part.strip()
-                    if part and len(part) > 3:  # Skip very short segments
-                        segments.append(part)
+        for part in _SEGMENT_BREAK.split(text):
+            part = part.strip()
+            if len(part) > 3:  # Skip very short segments
+                segments.append(part)
         
         return segments if segments else [text.strip()]
 
@@ -1791,26 +2226,53 @@ class FlexibleARCOSConverter:
         """Find best matching voice file - FLEXIBLE approach"""
         text_lower = text.lower().strip()
         
+        # Segments repeat across nodes (press 1, goodbye, ...) - score each distinct text once
+        match_cache = self._match_cache
+        match = match_cache.get(text_lower, _NOT_CACHED)
+        if match is not _NOT_CACHED:
+            return match
+        
+        match = self._score_best_match(text_lower)
+        _store_bounded(match_cache, text_lower, match)
+        return match
+
+    def _score_best_match(self, text_lower: str) -> Optional[str]:
+        """Score every voice file against normalised text and return the best callflow id"""
         # Try exact match first
-        for voice_file in self.voice_files:
-            if voice_file.transcript.lower() == text_lower:
-                return voice_file.callflow_id
+        exact = self._exact_transcript_index.get(text_lower)
+        if exact is not None:
+            return exact
         
         # Try partial matching
         best_match = None
         best_score = 0
+        text_words = frozenset(text_lower.split())
+        text_word_count = max(len(text_words), 1)
+        text_length = len(text_lower)
         
-        for voice_file in self.voice_files:
-            # Calculate similarity
-            similarity = SequenceMatcher(None, text_lower, voice_file.transcript.lower()).ratio()
-            
+        for matcher, voice_file in self._match_candidates:
             # Also check word overlap
-            text_words = set(text_lower.split())
-            transcript_words = set(voice_file.transcript.lower().split())
-            word_overlap = len(text_words.intersection(transcript_words))
+            overlap_score = (len(text_words & voice_file.transcript_tokens) / text_word_count) * 0.3
+            
+            # SequenceMatcher.real_quick_ratio() bounds ratio() from above using lengths alone -
+            # computed inline, skip files that cannot beat the best score
+            transcript_length = len(voice_file.transcript_lower)
+            length = text_length + transcript_length
+            quick_ratio = 2.0 * min(text_length, transcript_length) / length if length else 1.0
+            bound = quick_ratio * 0.7 + overlap_score
+            if bound <= best_score or bound <= 0.3:
+                continue
+            
+            # Indel similarity counts the longest common subsequence, which no SequenceMatcher match
+            # set can exceed, so it is a tighter bound (with slack for its different float rounding)
+            if _indel_similarity is not None:
+                bound = _indel_similarity(text_lower, voice_file.transcript_lower) * 0.7 + overlap_score + 1e-9
+                if bound <= best_score or bound <= 0.3:
+                    continue
             
             # Combined score
-            score = similarity * 0.7 + (word_overlap / max(len(text_words), 1)) * 0.3
+            matcher.set_seq1(text_lower)
+            score = matcher.ratio() * 0.7 + overlap_score
             
             if score > best_score and score > 0.3:  # Lower threshold for flexibility
                 best_score = score
@@ -1820,225 +2282,161 @@ class FlexibleARCOSConverter:
 
     def _clean_inbound_flow_nodes(self, ivr_flow: List[Dict]) -> List[Dict]:
         """Remove unnecessary nodes for inbound flows based on developer feedback"""
-        cleaned_flow = []
-        
+        # Look for inbound markers in the same pass that updates goto references
+        is_inbound = False
         for node in ivr_flow:
-            label = node.get('label', '')
-            
-            # Skip unnecessary nodes for inbound flows
-            if label in ['Main Menu', 'Hangup'] and any('returnsub' in n.get('', {}) for n in ivr_flow):
-                print(f"REMOVING: Unnecessary inbound node: {label}")
-                continue
+            if not is_inbound:
+                is_inbound = 'returnsub' in node.get('', {})
             
             # Update goto references to removed nodes
             if 'goto' in node:
-                if node['goto'] in ['Main Menu', 'Hangup']:
+                if node['goto'] in _INBOUND_REDUNDANT_LABELS:
                     # For inbound flows, acceptance should use returnsub
-                    if 'accept' in label.lower():
+                    if 'accept' in node.get('label', '').lower():
                         # Remove goto, the returnsub will handle flow
                         del node['goto']
                     else:
                         node['goto'] = 'hangup'
-            
+        
+        if not is_inbound:
+            # Nothing to remove - nodes were updated in place, keep the same list
+            return ivr_flow
+        
+        # Skip unnecessary nodes for inbound flows
+        cleaned_flow = []
+        for node in ivr_flow:
+            label = node.get('label', '')
+            if label in _INBOUND_REDUNDANT_LABELS:
+                logger.debug("REMOVING: Unnecessary inbound node: %s", label)
+                continue
             cleaned_flow.append(node)
         
         return cleaned_flow
 
     def _generate_javascript_output(self, ivr_flow: List[Dict]) -> str:
         """Generate production JavaScript output matching allflows LITE structure"""
+        node_blocks = [_node_to_javascript(node) for node in ivr_flow]
         
-        js_output = "module.exports = [\n"
-        
-        for i, node in enumerate(ivr_flow):
-            js_output += "    {\n"
-            
-            for key, value in node.items():
-                if isinstance(value, str):
-                    # Clean log entries - no truncation or double quotes
-                    if key == "log":
-                        # Remove quotes and truncation
-                        clean_value = value.replace('"', '').replace('...', '').strip()
-                        if len(clean_value) > 100:
-                            clean_value = clean_value[:100]  # Reasonable limit without "..."
-                        js_output += f'        {key}: "{clean_value}",\n'
-                    else:
-                        escaped_value = value.replace('"', '\\"').replace('\n', '\\n')
-                        js_output += f'        {key}: "{escaped_value}",\n'
-                        
-                elif isinstance(value, list):
-                    # Handle arrays - special formatting for gosub
-                    if key == "gosub" and len(value) == 3:
-                        # Simple gosub format: ["SaveCallResult", 1001, "Accept"]
-                        js_output += f'        {key}: ["{value[0]}", {value[1]}, "{value[2]}"],\n'
-                    else:
-                        js_output += f'        {key}: [\n'
-                        for j, item in enumerate(value):
-                            if isinstance(item, str):
-                                escaped_item = item.replace('"', '\\"')
-                                js_output += f'            "{escaped_item}"'
-                            else:
-                                js_output += f'            {json.dumps(item)}'
-                            if j < len(value) - 1:
-                                js_output += ","
-                            js_output += "\n"
-                        js_output += "        ],\n"
-                        
-                elif isinstance(value, dict):
-                    # Handle objects - NO quotes around property names for allflows LITE format
-                    js_output += f'        {key}: {{\n'
-                    dict_items = list(value.items())
-                    for j, (dict_key, dict_value) in enumerate(dict_items):
-                        # Check if dict_key should be unquoted (numbers, error, none, etc.)
-                        if dict_key.isdigit() or dict_key in ['error', 'none', 'yes', 'no']:
-                            property_name = dict_key  # No quotes for numbers and standard keys
-                        else:
-                            property_name = dict_key  # Keep as is for other keys
-                            
-                        if isinstance(dict_value, str):
-                            escaped_dict_value = dict_value.replace('"', '\\"')
-                            js_output += f'            {property_name}: "{escaped_dict_value}"'
-                        else:
-                            js_output += f'            {property_name}: {json.dumps(dict_value)}'
-                        if j < len(dict_items) - 1:
-                            js_output += ","
-                        js_output += "\n"
-                    js_output += "        },\n"
-                    
-                elif isinstance(value, int):
-                    js_output += f'        {key}: {value},\n'
-                else:
-                    js_output += f'        {key}: {json.dumps(value)},\n'
-            
-            js_output += "    }"
-            if i < len(ivr_flow) - 1:
-                js_output += ","
-            js_output += "\n"
-        
-        js_output += "];\n"
-        return js_output
+        if not node_blocks:
+            return "module.exports = [\n];\n"
+        return "module.exports = [\n" + ",\n".join(node_blocks) + "\n];\n"
 
     def _add_essential_nodes(self, ivr_flow: List[Dict]) -> List[Dict]:
         """Add essential nodes that are always needed based on lead programmer feedback"""
-        existing_labels = {node.get('label', '') for node in ivr_flow}
-        
-        # Check if we need PIN logic
-        has_pin_requirement = any('pin' in node.get('label', '').lower() or 
-                                'pin' in str(node.get('playPrompt', '')).lower() 
-                                for node in ivr_flow)
+        # One pass over the flow for existing labels, PIN logic and outbound patterns
+        existing_labels = set()
+        has_pin_requirement = False
+        has_outbound_patterns = False
+        for node in ivr_flow:
+            label = node.get('label', '')
+            existing_labels.add(label)
+            label_lower = label.lower()
+            if not has_pin_requirement:
+                has_pin_requirement = 'pin' in label_lower or 'pin' in str(node.get('playPrompt', '')).lower()
+            if not has_outbound_patterns:
+                has_outbound_patterns = 'callout' in label_lower or 'answering machine' in label_lower
         
         # Add Check PIN node if PIN logic is detected
         if has_pin_requirement and 'Check PIN' not in existing_labels:
-            check_pin_node = {
-                "label": "Check PIN",
-                "branchOn": "{{pin_req}}",
-                "branch": {
-                    "1": "Enter PIN",
-                    "next": "Callout"
-                }
-            }
-            ivr_flow.append(check_pin_node)
-            
-            # Add Enter PIN node
-            enter_pin_node = {
-                "label": "Enter PIN",
-                "log": "Please enter your four digit PIN followed by the pound key",
-                "playPrompt": "callflow:1008",
-                "getDigits": {
-                    "numDigits": 5,
-                    "maxTries": 3,
-                    "maxTime": 7,
-                    "validChoices": "{{pin}}",
-                    "errorPrompt": "callflow:1009",
-                    "nonePrompt": "callflow:1009"
-                },
-                "branch": {
-                    "error": "Problems",
-                    "none": "Problems"
-                }
-            }
-            ivr_flow.append(enter_pin_node)
+            ivr_flow += [_copy_node_template(template) for template in _PIN_NODE_TEMPLATES]
         
         # Add Problems node if not present (ALWAYS needed)
         if 'Problems' not in existing_labels:
-            problems_node = {
-                "label": "Problems",
-                "gosub": ["SaveCallResult", 1198, "Error Out"]
-            }
-            ivr_flow.append(problems_node)
-            
-            # Add the error message part
-            problems_message_node = {
-                "nobarge": 1,
-                "playLog": [
-                    "I'm sorry you are having problems.",
-                    "Please have",
-                    "Employee name",
-                    "call the",
-                    "Company name",
-                    "callout system",
-                    "at",
-                    "speak phone num"
-                ],
-                "playPrompt": [
-                    "callflow:1351",
-                    "callflow:1017",
-                    "names:{{contact_id}}",
-                    "callflow:1174",
-                    "company:{{company_id}}",
-                    "callflow:1290",
-                    "callflow:1015",
-                    "digits:{{callback_number}}"
-                ],
-                "goto": "Goodbye"
-            }
-            ivr_flow.append(problems_message_node)
+            ivr_flow += [_copy_node_template(template) for template in _PROBLEMS_NODE_TEMPLATES]
         
         # Add Goodbye node if not present (ALWAYS needed)
         if 'Goodbye' not in existing_labels:
-            goodbye_node = {
-                "label": "Goodbye",
-                "log": "Goodbye(1029)",
-                "playPrompt": "callflow:1029",
-                "nobarge": 1,
-                "goto": "hangup"
-            }
-            ivr_flow.append(goodbye_node)
+            ivr_flow.append(_copy_node_template(_GOODBYE_NODE_TEMPLATE))
         
         # Add Intercept node for outbound calls
-        has_outbound_patterns = any('callout' in node.get('label', '').lower() or 
-                                   'answering machine' in node.get('label', '').lower()
-                                   for node in ivr_flow)
-        
         if has_outbound_patterns and 'Intercept' not in existing_labels:
-            intercept_node = {
-                "label": "Intercept",
-                "nobarge": 1,
-                "playLog": [
-                    "The system is currently calling another employee",
-                    "To respond to this callout",
-                    "please call the",
-                    "Company name",
-                    "callout system",
-                    "at",
-                    "speak phone number"
-                ],
-                "playPrompt": [
-                    "callflow:1481",
-                    "callflow:1482",
-                    "callflow:1352",
-                    "company:{{company_id}}",
-                    "callflow:1290",
-                    "callflow:1015",
-                    "digits:{{callback_number}}"
-                ],
-                "goto": "Goodbye"
-            }
-            ivr_flow.append(intercept_node)
+            ivr_flow.append(_copy_node_template(_INTERCEPT_NODE_TEMPLATE))
         
         return ivr_flow
 
 
 def convert_mermaid_to_ivr(mermaid_code: str, cf_general_csv=None, arcos_csv=None, use_dynamodb=True) -> Tuple[List[Dict], str]:
     """Main function for FLEXIBLE ARCOS-integrated conversion with DynamoDB support"""
+    if cf_general_csv is None and arcos_csv is None:
+        if not use_dynamodb:
+            # Static built-in tables - identical diagrams reuse an earlier conversion
+            ivr_flow, js_output = _cached_conversion(mermaid_code)
+            return copy.deepcopy(ivr_flow), js_output
+        # The voice table can change, so DynamoDB conversions share the converter, not results
+        converter, conversion_lock = _builtin_converter(True)
+        with conversion_lock:
+            return converter.convert_mermaid_to_ivr(mermaid_code)
+    converter = FlexibleARCOSConverter(cf_general_csv, arcos_csv, use_dynamodb)
+    return converter.convert_mermaid_to_ivr(mermaid_code)
+
+def convert_many(mermaid_codes: Iterable[str], cf_general_csv=None, arcos_csv=None, use_dynamodb=True) -> List[Tuple[List[Dict], str]]:
+    """Convert a batch of diagrams with one converter, loading the voice databases once.
+
+    Conversions keep no per-call state on the converter, so it is safe to reuse
+    for every diagram; it is not meant to be shared between threads. For
+    parallel batches, map convert_mermaid_to_ivr over a ProcessPoolExecutor.
+    """
     converter = FlexibleARCOSConverter(cf_general_csv, arcos_csv, use_dynamodb)
-    return converter.convert_mermaid_to_ivr(mermaid_code)
\ No newline at end of file
+    return [converter.convert_mermaid_to_ivr(mermaid_code) for mermaid_code in mermaid_codes]
+
+# Seconds a shared DynamoDB-backed converter is reused before the voice table is read again
+_VOICE_DATABASE_TTL_SECONDS = 300
+
+# use_dynamodb -> (shared converter, its conversion lock, time.monotonic() when it was loaded)
+_builtin_converters: Dict[bool, Tuple[FlexibleARCOSConverter, threading.Lock, float]] = {}
+# Guards _builtin_converters only - a conversion holds the lock of the converter it
+# runs on, since conversions on one converter share its primed matchers and caches
+_BUILTIN_CONVERTER_LOCK = threading.Lock()
+
+def _builtin_converter(use_dynamodb: bool) -> Tuple[FlexibleARCOSConverter, threading.Lock]:
+    """Converter over the built-in voice databases and the lock to hold while converting with it.
+
+    The static built-in tables are loaded once per process. A DynamoDB-backed
+    converter is reloaded after _VOICE_DATABASE_TTL_SECONDS, and one that fell
+    back to the dbinfo/built-in tables is used once and not kept, so the next
+    conversion tries DynamoDB again.
+    """
+    with _BUILTIN_CONVERTER_LOCK:
+        now = time.monotonic()
+        entry = _builtin_converters.get(use_dynamodb)
+        if entry is not None and (not use_dynamodb or now - entry[2] < _VOICE_DATABASE_TTL_SECONDS):
+            return entry[0], entry[1]
+        
+        converter = FlexibleARCOSConverter(use_dynamodb=use_dynamodb)
+        conversion_lock = threading.Lock()
+        if converter.voice_source == "fallback":
+            _builtin_converters.pop(use_dynamodb, None)
+        else:
+            _builtin_converters[use_dynamodb] = (converter, conversion_lock, now)
+        return converter, conversion_lock
+
+def reload_voice_database() -> None:
+    """Drop the shared converters, cached conversions and table stats so the voice databases are re-read"""
+    with _BUILTIN_CONVERTER_LOCK:
+        _builtin_converters.clear()
+    _cached_conversion.cache_clear()
+    clear_table_stats()
+
+@lru_cache(maxsize=256)
+def _cached_conversion(mermaid_code: str) -> Tuple[List[Dict], str]:
+    """Conversion result shared between calls; callers must copy the flow before handing it out.
+
+    Only conversions against the static built-in tables are cached - uploaded
+    CSV databases are file objects that cannot be keyed, and the DynamoDB
+    voice table changes without notice.
+    """
+    converter, conversion_lock = _builtin_converter(False)
+    with conversion_lock:
+        return converter.convert_mermaid_to_ivr(mermaid_code)
+
+def convert_mermaid_to_ivr_json(mermaid_code: str, cf_general_csv=None, arcos_csv=None, use_dynamodb=True) -> Tuple[bytes, str]:
+    """Convert and return the IVR flow as UTF-8 JSON bytes, ready to hand to an HTTP or storage layer.
+
+    Uses orjson or msgspec when installed and falls back to the standard library json module.
+    """
+    ivr_flow, js_output = convert_mermaid_to_ivr(mermaid_code, cf_general_csv, arcos_csv, use_dynamodb)
+    if orjson is not None:
+        return orjson.dumps(ivr_flow), js_output
+    if msgspec is not None:
+        return msgspec.json.encode(ivr_flow), js_output
+    return json.dumps(ivr_flow, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), js_output
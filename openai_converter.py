@@ -6,11 +6,21 @@ import re
 import logging
 import base64
 import io
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from pdf2image import convert_from_path
 import streamlit as st
-from openai import OpenAI
+
+# Mermaid code inside a markdown fence in model output
+_MERMAID_CODE_BLOCK = re.compile(r'```(?:mermaid)?\n(.*?)```', re.DOTALL)
+
+# Minimum structure of a usable diagram: flowchart definition, a node and a connection
+_REQUIRED_MERMAID_ELEMENTS = (
+    re.compile(r'flowchart\s+TD'),
+    re.compile(r'\w+\s*[\["{\(]'),
+    re.compile(r'-->')
+)
 
 class IVRPromptLibrary:
     """Enhanced prompting for exact IVR diagram reproduction"""
@@ -74,6 +84,9 @@ OUTPUT REQUIREMENTS:
 4. Keep all labeling and numbering
 5. Include every element shown"""
 
+    # System prompt for the recovery attempt, joined once instead of per call
+    RECOVERY_PROMPT = f"{SYSTEM_PROMPT}\n{ERROR_RECOVERY}"
+
 class ImageProcessor:
     """Enhanced image processing capabilities"""
     
@@ -104,6 +117,14 @@ class ImageProcessor:
             raise ValueError("Failed to extract image from PDF")
         return images[0]
 
+    @staticmethod
+    def to_data_url(image: Image.Image) -> str:
+        """Encode image as a PNG data URL for the vision API"""
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        # Prefix and base64 text are joined once - no separate base64 string outlives this call
+        return "data:image/png;base64," + base64.b64encode(buffered.getbuffer()).decode('ascii')
+
 class FlowchartConverter:
     """Enhanced OpenAI-powered flowchart converter"""
     
@@ -118,6 +139,8 @@ class FlowchartConverter:
         if not self.api_key:
             raise ValueError("OpenAI API key not found")
         
+        # The SDK is only loaded once a converter is actually created
+        from openai import OpenAI
         self.client = OpenAI(api_key=self.api_key)
         self.logger = logging.getLogger(__name__)
         self.image_processor = ImageProcessor()
@@ -149,10 +172,10 @@ class FlowchartConverter:
             else:
                 image = self.image_processor.process_image(file_path)
             
-            # Convert to base64
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            base64_image = base64.b64encode(buffered.getvalue()).decode()
+            # Convert to a data URL, shared with the recovery attempt; the decoded
+            # image is not needed while waiting on the API
+            image_url = self.image_processor.to_data_url(image)
+            del image
             
             # Make API call
             response = self.client.chat.completions.create(
@@ -172,7 +195,7 @@ class FlowchartConverter:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -191,7 +214,7 @@ class FlowchartConverter:
             if not self._validate_mermaid_syntax(mermaid_text):
                 # Try recovery with simpler conversion
                 self.logger.warning("Initial conversion failed validation, attempting recovery")
-                return self._attempt_recovery_conversion(base64_image)
+                return self._attempt_recovery_conversion(image_url)
             
             return mermaid_text
             
@@ -202,7 +225,7 @@ class FlowchartConverter:
     def _clean_mermaid_code(self, raw_text: str) -> str:
         """Clean and format Mermaid code"""
         # Extract code from markdown blocks if present
-        code_match = re.search(r'```(?:mermaid)?\n(.*?)```', raw_text, re.DOTALL)
+        code_match = _MERMAID_CODE_BLOCK.search(raw_text)
         if code_match:
             raw_text = code_match.group(1)
         
@@ -211,20 +234,14 @@ class FlowchartConverter:
             raw_text = f'flowchart TD\n{raw_text}'
         
         # Clean up whitespace and empty lines
-        lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+        lines = [line for line in map(str.strip, raw_text.splitlines()) if line]
         return '\n'.join(lines)
 
     def _validate_mermaid_syntax(self, mermaid_text: str) -> bool:
         """Validate basic Mermaid syntax"""
-        required_elements = [
-            r'flowchart\s+TD',    # Must have flowchart definition
-            r'\w+\s*[\["{\(]',    # Must have at least one node
-            r'-->'                # Must have at least one connection
-        ]
-        
-        return all(re.search(pattern, mermaid_text) for pattern in required_elements)
+        return all(pattern.search(mermaid_text) for pattern in _REQUIRED_MERMAID_ELEMENTS)
 
-    def _attempt_recovery_conversion(self, base64_image: str) -> str:
+    def _attempt_recovery_conversion(self, image_url: str) -> str:
         """Attempt simplified conversion for recovery"""
         try:
             response = self.client.chat.completions.create(
@@ -232,7 +249,7 @@ class FlowchartConverter:
                 messages=[
                     {
                         "role": "system",
-                        "content": f"{IVRPromptLibrary.SYSTEM_PROMPT}\n{IVRPromptLibrary.ERROR_RECOVERY}"
+                        "content": IVRPromptLibrary.RECOVERY_PROMPT
                     },
                     {
                         "role": "user",
@@ -244,7 +261,7 @@ class FlowchartConverter:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -264,4 +281,17 @@ class FlowchartConverter:
 def process_flow_diagram(file_path: str, api_key: Optional[str] = None) -> str:
     """Convenience wrapper for diagram conversion"""
     converter = FlowchartConverter(api_key)
-    return converter.convert_diagram(file_path)
\ No newline at end of file
+    return converter.convert_diagram(file_path)
+
+def process_flow_diagrams(file_paths: List[str], api_key: Optional[str] = None, max_workers: int = 8) -> List[str]:
+    """Convert several diagrams concurrently, returning Mermaid code in input order
+
+    Each conversion waits on the OpenAI API, so threads overlap the requests;
+    one converter (and its client) is shared. The first failed conversion
+    raises, as convert_diagram does.
+    """
+    converter = FlowchartConverter(api_key)
+    if not file_paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as executor:
+        return list(executor.map(converter.convert_diagram, file_paths))
\ No newline at end of file
@@ -1,23 +1,50 @@
 """
 Direct IVR conversion using OpenAI with specific IVR format handling
 """
-from typing import Dict, List, Any
-from openai import OpenAI
+from typing import Dict, List, Any, Tuple
+import copy
 import json
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Optional: orjson parses the generated node array faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
-class OpenAIIVRConverter:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+# Start of the JavaScript array the model is asked to return
+_MODULE_EXPORTS_PREFIX = "module.exports = ["
+_JSON_DECODER = json.JSONDecoder()
 
-    def convert_to_ivr(self, mermaid_code: str) -> str:
-        """Convert Mermaid diagram to IVR configuration using GPT-4"""
-        
-        prompt = f"""You are an expert IVR system developer. Convert this Mermaid flowchart into a complete IVR JavaScript configuration following these exact requirements:
+# Returned when conversion fails - a lone error handler node, and its JavaScript
+_ERROR_HANDLER_NODE = {
+    "label": "Problems",
+    "log": "Error handler",
+    "playPrompt": ["callflow:1351"],
+    "goto": "Goodbye"
+}
+_ERROR_HANDLER_IVR = f"module.exports = {json.dumps([_ERROR_HANDLER_NODE], indent=2)};"
+
+def _decode_node_array(ivr_code: str, array_idx: int) -> Tuple[Any, int]:
+    """Decode the JSON array starting at array_idx, returning it and the index just past it"""
+    if orjson is not None:
+        # A well-formed response has nothing but ";" after the array, so it ends at
+        # the last "]" - anything orjson rejects is left to the stdlib decoder
+        end_idx = ivr_code.rfind("]") + 1
+        try:
+            return orjson.loads(ivr_code[array_idx:end_idx]), end_idx
+        except orjson.JSONDecodeError:
+            pass
+    return _JSON_DECODER.raw_decode(ivr_code, array_idx)
+
+def _error_handler_nodes() -> List[Dict[str, Any]]:
+    """Fresh node list matching _ERROR_HANDLER_IVR"""
+    return [copy.deepcopy(_ERROR_HANDLER_NODE)]
+
+# Instructions sent with every diagram; {mermaid_code} is filled in per call
+_IVR_PROMPT_TEMPLATE = """You are an expert IVR system developer. Convert this Mermaid flowchart into a complete IVR JavaScript configuration following these exact requirements:
 
         The IVR system requires specific configuration format:
 
@@ -84,6 +111,25 @@ class OpenAIIVRConverter:
         Return only the JavaScript code in the format:
         module.exports = [ ... ];"""
 
+class OpenAIIVRConverter:
+    def __init__(self, api_key: str):
+        # Imported here so the module loads without pulling in the OpenAI SDK
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
+
+    def convert_to_ivr(self, mermaid_code: str) -> str:
+        """Convert Mermaid diagram to IVR configuration using GPT-4"""
+        return self.convert_to_ivr_nodes(mermaid_code)[1]
+
+    def convert_to_ivr_nodes(self, mermaid_code: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Convert Mermaid diagram to IVR nodes and their JavaScript using GPT-4
+
+        The nodes are the ones parsed while validating the model output, so
+        callers needing both do not parse the JavaScript a second time.
+        """
+        
+        prompt = _IVR_PROMPT_TEMPLATE.format(mermaid_code=mermaid_code)
+
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o",
@@ -104,40 +150,36 @@ class OpenAIIVRConverter:
             # Extract and clean the response
             ivr_code = response.choices[0].message.content.strip()
             
-            # Extract just the JavaScript code
-            if "module.exports = [" in ivr_code:
-                start_idx = ivr_code.find("module.exports = [")
-                end_idx = ivr_code.rfind("];") + 2
-                ivr_code = ivr_code[start_idx:end_idx]
-
             # Validate basic structure
-            if not (ivr_code.startswith("module.exports = [") and ivr_code.endswith("];")):
+            start_idx = ivr_code.find(_MODULE_EXPORTS_PREFIX)
+            if start_idx == -1:
                 raise ValueError("Invalid IVR code format generated")
 
-            # Basic validation of node structure
+            # Basic validation of node structure - decode the array in place, where it
+            # ends is where the JSON ends, so no slicing up to the closing "];"
+            array_idx = start_idx + len(_MODULE_EXPORTS_PREFIX) - 1
             try:
-                nodes = json.loads(ivr_code[16:-1])  # Remove module.exports = and ;
-                if not isinstance(nodes, list):
-                    raise ValueError("Generated code is not a valid node array")
-                for node in nodes:
-                    if not isinstance(node, dict) or 'label' not in node:
-                        raise ValueError("Invalid node structure")
+                nodes, end_idx = _decode_node_array(ivr_code, array_idx)
             except json.JSONDecodeError:
                 raise ValueError("Generated code is not valid JSON")
+            for node in nodes:
+                if not isinstance(node, dict) or 'label' not in node:
+                    raise ValueError("Invalid node structure")
+
+            # Extract just the JavaScript code
+            return nodes, ivr_code[start_idx:end_idx] + ";"
 
-            return ivr_code
+        except ValueError as e:
+            # The model answered, but not with a usable module.exports array
+            logger.error("Generated IVR code rejected: %s", e)
+            return _error_handler_nodes(), _ERROR_HANDLER_IVR
 
         except Exception as e:
-            logger.error(f"IVR conversion failed: {str(e)}")
+            # The OpenAI client has already retried timeouts, rate limits and server
+            # errors with backoff by the time an API error reaches here
+            logger.error("IVR conversion failed: %s", e)
             # Return a basic error handler node
-            return '''module.exports = [
-  {
-    "label": "Problems",
-    "log": "Error handler",
-    "playPrompt": ["callflow:1351"],
-    "goto": "Goodbye"
-  }
-];'''
+            return _error_handler_nodes(), _ERROR_HANDLER_IVR
 
 def convert_mermaid_to_ivr(mermaid_code: str, api_key: str) -> str:
     """Wrapper function for Mermaid to IVR conversion"""
@@ -6,6 +6,14 @@ from enum import Enum, auto
 from typing import Dict, List, Optional, Union, Set
 from dataclasses import dataclass, field
 
+# Node definitions: A["text"], A{"text"}, A("text") and A[("text")] in one anchored pattern
+_NODE_DEFINITION = re.compile(
+    r'^\s*(\w+)\s*(?:\["([^"]+)"\]|\{"([^"]+)"\}|\("([^"]+)"\)|\[\("([^"]+)"\)\])'
+)
+_DIRECTION = re.compile(r'(?:flowchart|graph)\s+(\w+)')
+_SUBGRAPH = re.compile(r'subgraph\s+(\w+)(?:\s*\[(.*?)\])?')
+_CLASS_DEF = re.compile(r'classDef\s+(\w+)\s+(.*?)$')
+
 class NodeType(Enum):
     """Extended node types for IVR flows"""
     START = auto()
@@ -20,7 +28,9 @@ class NodeType(Enum):
     ERROR = auto()       # New: For error handling
     RETRY = auto()       # New: For retry logic
 
-@dataclass
+_INTERACTIVE_TYPES = frozenset([NodeType.INPUT, NodeType.MENU, NodeType.DECISION])
+
+@dataclass(slots=True)
 class Node:
     """Enhanced node representation"""
     id: str
@@ -32,9 +42,9 @@ class Node:
     
     def is_interactive(self) -> bool:
         """Check if node requires user interaction"""
-        return self.node_type in {NodeType.INPUT, NodeType.MENU, NodeType.DECISION}
+        return self.node_type in _INTERACTIVE_TYPES
 
-@dataclass
+@dataclass(slots=True)
 class Edge:
     """Enhanced edge representation"""
     from_id: str
@@ -82,6 +92,12 @@ class MermaidParser:
             ]
         }
 
+        # One compiled alternation per node type, checked in node_patterns order
+        self._type_rules = [
+            (node_type, re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)))
+            for node_type, patterns in self.node_patterns.items()
+        ]
+
         self.edge_patterns = {
             # Standard connection
             r'-->': '',
@@ -92,6 +108,11 @@ class MermaidParser:
             # Thick connection for primary paths
             r'==+>': 'primary'
         }
+        # Compiled once; tried in edge_patterns order
+        self._edge_rules = [
+            (re.compile(rf'(\w+)\s*{pattern}\s*(\w+)'), style)
+            for pattern, style in self.edge_patterns.items()
+        ]
 
     def parse(self, mermaid_text: str) -> Dict:
         """
@@ -103,7 +124,8 @@ class MermaidParser:
         Returns:
             Dict containing parsed nodes, edges, and metadata
         """
-        lines = [line.strip() for line in mermaid_text.split('\n') if line.strip()]
+        # Strip each line once, dropping the blank ones
+        lines = [line for line in map(str.strip, mermaid_text.split('\n')) if line]
         
         nodes = {}
         edges = []
@@ -119,19 +141,19 @@ class MermaidParser:
         try:
             for line in lines:
                 # Skip comments and directives
-                if line.startswith('%%') or line.startswith('%'):
+                if line.startswith('%'):
                     continue
                 
                 # Parse flowchart direction
-                if line.startswith('flowchart') or line.startswith('graph'):
-                    direction_match = re.match(r'(?:flowchart|graph)\s+(\w+)', line)
+                if line.startswith(('flowchart', 'graph')):
+                    direction_match = _DIRECTION.match(line)
                     if direction_match:
                         metadata['direction'] = direction_match.group(1)
                     continue
                 
                 # Handle subgraphs
                 if line.startswith('subgraph'):
-                    subgraph_match = re.match(r'subgraph\s+(\w+)(?:\s*\[(.*?)\])?', line)
+                    subgraph_match = _SUBGRAPH.match(line)
                     if subgraph_match:
                         current_subgraph = subgraph_match.group(1)
                         title = subgraph_match.group(2) or current_subgraph
@@ -179,38 +201,30 @@ class MermaidParser:
 
     def _parse_node(self, line: str) -> Optional[tuple]:
         """Parse node definition"""
-        # Match node patterns with various syntax forms
-        node_patterns = [
-            # ["text"] form
-            r'^\s*(\w+)\s*\["([^"]+)"\]',
-            # {"text"} form for decisions
-            r'^\s*(\w+)\s*\{"([^"]+)"\}',
-            # ("text") form
-            r'^\s*(\w+)\s*\("([^"]+)"\)',
-            # [("text")] form
-            r'^\s*(\w+)\s*\[\("([^"]+)"\)\]'
-        ]
-        
-        for pattern in node_patterns:
-            match = re.match(pattern, line)
-            if match:
-                node_id, text = match.groups()
-                node_type = self._determine_node_type(text)
-                return node_id, Node(
-                    id=node_id,
-                    raw_text=text,
-                    node_type=node_type
-                )
+        # Match all node syntax forms with a single anchored pattern
+        match = _NODE_DEFINITION.match(line)
+        if match:
+            node_id = match.group(1)
+            text = next(group for group in match.groups()[1:] if group is not None)
+            node_type = self._determine_node_type(text)
+            return node_id, Node(
+                id=node_id,
+                raw_text=text,
+                node_type=node_type
+            )
         return None
 
     def _parse_edge(self, line: str) -> Optional[Edge]:
         """Parse edge definition"""
-        for pattern, style in self.edge_patterns.items():
-            match = re.search(f'(\w+)\s*{pattern}\s*(\w+)', line)
+        # Every edge form contains '-' or '=' - skip the regex scans for lines without either
+        if '-' not in line and '=' not in line:
+            return None
+        for rule, style in self._edge_rules:
+            match = rule.search(line)
             if match:
-                from_id, to_id = match.groups()
+                from_id, to_id = match.group(1), match.group(match.re.groups)
                 label = None
-                if 'label' in style and len(match.groups()) > 2:
+                if 'label' in style and match.re.groups > 2:
                     label = match.group(2)
                 return Edge(
                     from_id=from_id,
@@ -222,7 +236,7 @@ class MermaidParser:
 
     def _parse_style(self, line: str) -> Optional[tuple]:
         """Parse style definition"""
-        style_match = re.match(r'classDef\s+(\w+)\s+(.*?)$', line)
+        style_match = _CLASS_DEF.match(line)
         if style_match:
             class_name, styles = style_match.groups()
             return class_name, styles
@@ -232,13 +246,16 @@ class MermaidParser:
         """Determine node type from text content"""
         text_lower = text.lower()
         
-        for node_type, patterns in self.node_patterns.items():
-            if any(re.search(pattern, text_lower) for pattern in patterns):
+        for node_type, rule in self._type_rules:
+            if rule.search(text_lower):
                 return node_type
         
         return NodeType.ACTION
 
+# parse() keeps no state between calls, so the convenience wrapper reuses one parser
+# instead of rebuilding and recompiling its rule tables for every diagram
+_DEFAULT_PARSER = MermaidParser()
+
 def parse_mermaid(mermaid_text: str) -> Dict:
     """Convenience wrapper for parsing Mermaid diagrams"""
-    parser = MermaidParser()
-    return parser.parse(mermaid_text)
\ No newline at end of file
+    return _DEFAULT_PARSER.parse(mermaid_text)
\ No newline at end of file
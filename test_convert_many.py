@@ -0,0 +1,42 @@
+"""
+Test batch conversion with a shared converter
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from mermaid_ivr_converter import convert_mermaid_to_ivr, convert_many
+
+BATCH = [
+    """flowchart TD
+A["Welcome<br/>Press 1 if this is (employee).<br/>Press 7 if (employee) is not home."] -->|"1"| B["Enter PIN"]
+A -->|"7"| C["Not Home"]""",
+    """flowchart TD
+A["Are you available to work this callout?"] -->|"Yes"| B["An accepted response has been recorded"]
+A -->|"No"| C["Your response has been recorded as a decline"]""",
+    """flowchart TD
+A["This is an important call notification message."] --> B["Thank you, good bye"]"""
+]
+
+def test_convert_many_matches_single_conversions():
+    """Each batch result equals the result of converting that diagram on its own"""
+    print("Testing convert_many")
+    print("=" * 50)
+
+    results = convert_many(BATCH, use_dynamodb=False)
+    if len(results) != len(BATCH):
+        print(f"FAIL: expected {len(BATCH)} results, got {len(results)}")
+        return False
+
+    for i, (mermaid_code, result) in enumerate(zip(BATCH, results), 1):
+        if result != convert_mermaid_to_ivr(mermaid_code, use_dynamodb=False):
+            print(f"FAIL: diagram {i} differs from a standalone conversion")
+            return False
+        print(f"PASS: diagram {i} - {len(result[0])} nodes")
+
+    return True
+
+if __name__ == "__main__":
+    success = test_convert_many_matches_single_conversions()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,54 @@
+"""
+Test loading voice file databases from uploaded CSV files
+"""
+
+import sys
+import os
+import io
+sys.path.append(os.path.dirname(__file__))
+
+from mermaid_ivr_converter import FlexibleARCOSConverter
+
+ARCOS_CSV = """Company,Folder,File Name,Transcript
+ARCOS,callflow,1191.ulaw,This is an electric callout
+
+,,,Press 1 if you are the employee
+"""
+
+CLIENT_CSV = """File Name,Transcript
+2001.ulaw,Thank you
+"""
+
+def test_csv_loading():
+    """Rows load with column defaults and blank lines are skipped"""
+    print("Testing CSV voice file loading")
+    print("=" * 50)
+
+    converter = FlexibleARCOSConverter(
+        cf_general_csv=io.BytesIO(CLIENT_CSV.encode('utf-8')),
+        arcos_csv=io.StringIO(ARCOS_CSV),
+        use_dynamodb=False
+    )
+
+    loaded = [(vf.company, vf.folder, vf.file_name, vf.transcript, vf.callflow_id, vf.priority)
+              for vf in converter.voice_files]
+    expected = [
+        ("ARCOS", "callflow", "1191.ulaw", "This is an electric callout", "1191", 100),
+        ("", "", "", "Press 1 if you are the employee", "ARCOS1", 100),
+        ("", "", "2001.ulaw", "Thank you", "2001", 200),
+    ]
+
+    if loaded != expected:
+        print(f"FAIL: unexpected voice files {loaded}")
+        return False
+
+    if converter._find_best_match_flexible("thank you") != "2001":
+        print("FAIL: exact transcript match did not use the client file")
+        return False
+
+    print(f"PASS: {len(loaded)} voice files loaded from CSV")
+    return True
+
+if __name__ == "__main__":
+    success = test_csv_loading()
+    sys.exit(0 if success else 1)
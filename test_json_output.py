@@ -0,0 +1,43 @@
+"""
+Test the JSON bytes output path of the converter
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(__file__))
+
+from mermaid_ivr_converter import convert_mermaid_to_ivr, convert_mermaid_to_ivr_json
+
+SAMPLE_MERMAID = """flowchart TD
+A["Welcome<br/>This is an electric callout from (Level 2).<br/>Press 1 if this is (employee).<br/>Press 3 if you need more time."] -->|"1"| B{"Correct PIN?"}
+A -->|"3"| C["Goodbye"]
+B -->|"Yes"| D["Thank you, good bye"]
+B -->|"No"| E["Invalid entry. Please try again."]"""
+
+def test_json_output_matches_flow():
+    """The JSON bytes decode to the same flow convert_mermaid_to_ivr returns"""
+    print("Testing convert_mermaid_to_ivr_json")
+    print("=" * 50)
+
+    json_bytes, js_output = convert_mermaid_to_ivr_json(SAMPLE_MERMAID, use_dynamodb=False)
+    ivr_flow, expected_js = convert_mermaid_to_ivr(SAMPLE_MERMAID, use_dynamodb=False)
+
+    if not isinstance(json_bytes, bytes):
+        print(f"FAIL: expected bytes, got {type(json_bytes).__name__}")
+        return False
+
+    if json.loads(json_bytes) != ivr_flow:
+        print("FAIL: JSON output does not match the converted flow")
+        return False
+
+    if js_output != expected_js:
+        print("FAIL: JavaScript output differs between entry points")
+        return False
+
+    print(f"PASS: {len(ivr_flow)} nodes serialized to {len(json_bytes)} bytes")
+    return True
+
+if __name__ == "__main__":
+    success = test_json_output_matches_flow()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,34 @@
+"""
+Test node definition order when a quoted label contains square brackets
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from mermaid_ivr_converter import convert_mermaid_to_ivr
+
+# No start indicator - the flow starts at the first node the parser defines
+BRACKET_LABEL_MERMAID = """flowchart TD
+S[Some Text] --> O(Other End)
+X["Call [555] now"] -->|"1"| G["Goodbye"]
+O --> G"""
+
+def test_quoted_label_with_bracket_keeps_order():
+    """A["... [555] ..."] still ranks with the quoted square nodes"""
+    print("Testing node order with ] inside a quoted label")
+    print("=" * 50)
+
+    ivr_flow, _ = convert_mermaid_to_ivr(BRACKET_LABEL_MERMAID, use_dynamodb=False)
+    labels = [node.get('label') for node in ivr_flow]
+
+    if labels[:4] != ['Call', 'Goodbye', 'Some Text', 'Other End']:
+        print(f"FAIL: unexpected node order {labels}")
+        return False
+
+    print(f"PASS: flow starts at '{labels[0]}'")
+    return True
+
+if __name__ == "__main__":
+    success = test_quoted_label_with_bracket_keeps_order()
+    sys.exit(0 if success else 1)
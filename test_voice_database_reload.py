@@ -0,0 +1,42 @@
+"""
+Test reuse and reloading of the shared built-in voice database converters
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+import mermaid_ivr_converter as converter_module
+
+def test_voice_database_reload():
+    """Static tables are shared, each converter has its own lock, fallback converters are not kept"""
+    print("Testing shared voice database converters")
+    print("=" * 50)
+
+    converter_module.reload_voice_database()
+    static_converter, static_lock = converter_module._builtin_converter(False)
+    if converter_module._builtin_converter(False) != (static_converter, static_lock):
+        print("FAIL: built-in tables were loaded twice")
+        return False
+
+    dynamodb_converter, dynamodb_lock = converter_module._builtin_converter(True)
+    if dynamodb_lock is static_lock:
+        print("FAIL: converters share one conversion lock")
+        return False
+
+    kept = converter_module._builtin_converters.get(True, (None,))[0] is dynamodb_converter
+    if kept != (dynamodb_converter.voice_source != "fallback"):
+        print(f"FAIL: {dynamodb_converter.voice_source} converter kept={kept}")
+        return False
+
+    converter_module.reload_voice_database()
+    if converter_module._builtin_converters:
+        print("FAIL: reload_voice_database left shared converters behind")
+        return False
+
+    print(f"PASS: DynamoDB source was '{dynamodb_converter.voice_source}', kept={kept}")
+    return True
+
+if __name__ == "__main__":
+    success = test_voice_database_reload()
+    sys.exit(0 if success else 1)